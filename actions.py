@@ -0,0 +1,201 @@
+import asyncio
+import functools
+import inspect
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from config import SKILL_WORKERS
+from skills import (
+    scrape_webpage, save_file, edit_file, search_files, git_clone, git_pull,
+    git_push, analyze_code, check_code_quality, install_dependencies,
+    generate_documentation, run_unit_tests
+)
+
+# An action item is one line of an agent's response in one of the forms
+#   message|<recipient>|<text>
+#   email|<recipient>|<subject>|<body>
+#   command|<skill>|<argument>|...
+ActionItem = namedtuple('ActionItem', ['kind', 'target', 'args', 'line'])
+
+ACTION_ITEM_PATTERN = re.compile(r"^(?:[-*]|\d+[.)])?\s*`?(message|email|command)\s*\|(.*?)`?$", re.IGNORECASE)
+
+def parse_action_item(line):
+    """
+    Parse a single line of agent output into an ActionItem.
+
+    Args:
+        line (str): One complete line of the response.
+
+    Returns:
+        ActionItem: The parsed item, or None if the line is not a well-formed action item.
+    """
+    match = ACTION_ITEM_PATTERN.match(line.strip())
+    if not match:
+        return None
+    kind = match.group(1).lower()
+    raw_fields = match.group(2).split('|')
+    fields = [field.strip() for field in raw_fields]
+    if not fields[0]:
+        return None
+
+    # Message and email text is kept as written, '|' and spacing included.
+    if kind == 'message' and len(fields) >= 2:
+        return ActionItem(kind, fields[0], ['|'.join(raw_fields[1:]).strip()], line)
+    if kind == 'email' and len(fields) >= 3:
+        return ActionItem(kind, fields[0], [fields[1], '|'.join(raw_fields[2:]).strip()], line)
+    if kind == 'command':
+        # Empty fields keep their position. Fields beyond the skill's parameters are
+        # part of its last argument, which may contain '|'.
+        args = raw_fields[1:]
+        skill = SKILL_REGISTRY.get(fields[0])
+        if skill:
+            count = len(inspect.signature(skill.function).parameters)
+            while len(args) > count and not args[-1].strip():
+                args.pop()
+            if len(args) > count:
+                args = args[:count - 1] + ['|'.join(args[count - 1:])]
+        return ActionItem(kind, fields[0], [arg.strip() for arg in args], line)
+    return None
+
+
+class LineBuffer:
+    """
+    Split a stream of text chunks into complete lines.
+
+    feed() returns the lines completed by a chunk; flush() returns whatever is left
+    once the stream ends.
+    """
+
+    def __init__(self):
+        self.partial = ""
+
+    def feed(self, chunk):
+        if "\n" not in chunk:
+            self.partial += chunk
+            return []
+        lines = (self.partial + chunk).split("\n")
+        self.partial = lines.pop()
+        return lines
+
+    def flush(self):
+        line, self.partial = self.partial, ""
+        return [line] if line else []
+
+
+def search_workspace(keyword, directory=None):
+    return search_files(directory or '.', keyword)
+
+# A command skill and the positions of its arguments that are paths. Paths are
+# resolved inside the agent's workspace; an omitted optional path argument is the
+# workspace itself.
+Skill = namedtuple('Skill', ['function', 'path_arguments'])
+
+SKILL_REGISTRY = {
+    'scrape_webpage': Skill(scrape_webpage, ()),
+    'save_file': Skill(save_file, (0,)),
+    'edit_file': Skill(edit_file, (0,)),
+    'search_files': Skill(search_workspace, (1,)),
+    'git_clone': Skill(git_clone, (1,)),
+    'git_pull': Skill(git_pull, (0,)),
+    'git_push': Skill(git_push, (0,)),
+    'analyze_code': Skill(analyze_code, (0,)),
+    'check_code_quality': Skill(check_code_quality, (0,)),
+    'install_dependencies': Skill(install_dependencies, (0,)),
+    'generate_documentation': Skill(generate_documentation, (0, 1)),
+    'run_unit_tests': Skill(run_unit_tests, (0,)),
+}
+
+# Skill names in config.AGENTS that permit the non-command action items.
+ACTION_PERMISSIONS = {'message': 'send_message', 'email': 'send_email'}
+
+class ActionError(Exception):
+    """Raised when an action item cannot be executed."""
+
+
+class ActionDispatcher:
+    """
+    Execute agents' action items.
+
+    Messages, emails and file writes go through the Environment. Commands are looked
+    up in SKILL_REGISTRY and checked against the agent's skills from config.AGENTS.
+    Heavy skills run in child processes through the Environment's SkillRunner and the
+    rest on a thread pool, so long-running skills do not hold up other agents' LLM
+    calls.
+    """
+
+    def __init__(self, env, max_workers=SKILL_WORKERS):
+        self.env = env
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='skill')
+
+    async def dispatch(self, agent, item):
+        """
+        Execute one action item and report the outcome to the agent.
+
+        Args:
+            agent (Agent): The agent that emitted the item.
+            item (ActionItem): The parsed action item.
+
+        Returns:
+            str: The result of a command, why the item could not be executed, or None.
+        """
+        try:
+            result = await self.execute(agent, item)
+        except Exception as e:
+            result = f"Could not execute '{item.line.strip()}': {e}"
+            self.env.print_formatted(agent.name, result)
+            agent.actions.append(result)
+            return result
+        if item.kind == 'command':
+            self.env.print_formatted(agent.name, f"{agent.name} ran {item.target}: {result}")
+            agent.actions.append(f"Ran {item.target}: {result}")
+        return result
+
+    async def execute(self, agent, item):
+        if item.kind == 'command' and item.target not in SKILL_REGISTRY:
+            raise ActionError(f"unknown command '{item.target}'")
+        permission = ACTION_PERMISSIONS.get(item.kind, item.target)
+        if permission not in agent.allowed_skills:
+            raise ActionError(f"{agent.name} does not have the '{permission}' skill")
+
+        if item.kind == 'message':
+            await self.env.send_message(agent.name, item.target, item.args[0])
+            return None
+        if item.kind == 'email':
+            subject, body = item.args
+            self.env.send_email(agent.name, [item.target], subject, body)
+            return None
+
+        skill = SKILL_REGISTRY[item.target]
+        args = list(item.args)
+        parameters = list(inspect.signature(skill.function).parameters.values())
+        for index in skill.path_arguments:
+            if index < len(args):
+                args[index] = self.resolve_path(agent, args[index])
+            elif index == len(args) and index < len(parameters) and parameters[index].default is not inspect.Parameter.empty:
+                args.append(self.resolve_path(agent, '.'))
+        try:
+            inspect.signature(skill.function).bind(*args)
+        except TypeError as e:
+            raise ActionError(f"invalid arguments for {item.target}: {e}") from e
+
+        if item.target == 'search_files':
+            # Served from the Environment's in-memory workspace index.
+            return await self.env.search_files(agent.name, *args)
+        if item.target in ('save_file', 'edit_file'):
+            # Written atomically, in order and indexed by the Environment's workspace files.
+            return await getattr(self.env, item.target)(*args)
+        if self.env.skill_runner.handles(item.target):
+            return await self.env.skill_runner.run(item.target, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(skill.function, *args))
+
+    def resolve_path(self, agent, path):
+        workspace = os.path.realpath(self.env.workspaces[agent.name])
+        resolved = os.path.realpath(os.path.join(workspace, path))
+        if resolved != workspace and not resolved.startswith(workspace + os.sep):
+            raise ActionError(f"path '{path}' is outside {agent.name}'s workspace")
+        return resolved
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
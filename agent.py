@@ -1,15 +1,26 @@
 import asyncio
 import base64
 
-import requests
 from api_integrations import APIIntegrations
-from bs4 import BeautifulSoup
+from memory import AgentMemory
+from actions import LineBuffer, parse_action_item
+from inbox import Inbox, CHATTER
+from config import STREAM_RESPONSES, FUSED_CALLS
+from structured_output import StructuredOutputError
 import os
-from skills import (
-    scrape_webpage, save_file, edit_file, search_files, git_clone, git_pull,
-    git_push, analyze_code, check_code_quality, install_dependencies,
-    generate_documentation, run_unit_tests
-)
+from skills import scrape_webpage
+
+# Response schemas for FUSED_CALLS, where a step and its follow-up share one call.
+THOUGHT_SCHEMA = {
+    "type": "object",
+    "properties": {"thought": {"type": "string"}, "summary": {"type": "string"}},
+    "required": ["thought", "summary"],
+}
+ACTION_SCHEMA = {
+    "type": "object",
+    "properties": {"action": {"type": "string"}, "evaluation": {"type": "string"}},
+    "required": ["action", "evaluation"],
+}
 
 class Agent:
     def __init__(self, name, role, responsibilities, skills, env, api_choice):
@@ -17,8 +28,13 @@ class Agent:
         self.role = role
         self.responsibilities = responsibilities
         self.skills = skills
-        self.actions = []
-        self.thoughts = []
+        self.allowed_skills = frozenset(skills)
+        self.actions = AgentMemory()
+        self.thoughts = AgentMemory()
+        self.action_items = []
+        self.action_tasks = []
+        self.inbox = Inbox()
+        self.digest_id = None
         self.env = env
         self.api_choice = api_choice
         self.api_integrations = APIIntegrations(api_choice, self.get_agent_data())
@@ -35,6 +51,37 @@ class Agent:
             "is_working": False,
         }
 
+    async def run(self):
+        """
+        Run the agent as an actor: sleep until an envelope arrives in the inbox, then
+        handle it. Envelopes are handled one at a time, so a turn never overlaps with
+        reading messages.
+        """
+        while True:
+            envelope = await self.inbox.get()
+            if envelope.kind == 'stop':
+                return
+            if envelope.kind == 'chat':
+                self.receive_messages(envelope.messages)
+                continue
+            # The caller may have cancelled the future (e.g. at shutdown) while the turn ran.
+            try:
+                result = await envelope.work(self)
+            except Exception as e:
+                if not envelope.future.done():
+                    envelope.future.set_exception(e)
+            else:
+                if not envelope.future.done():
+                    envelope.future.set_result(result)
+            finally:
+                if not envelope.future.done():
+                    envelope.future.cancel()
+
+    def receive_messages(self, messages):
+        for sender, message in messages:
+            self.env.print_formatted(self.name, f"{self.name} received a message from {sender}: '{message}'", border_style="▃▃▃")
+            self.actions.append(f"Received message from {sender}: '{message}'")
+
     async def go_to_office(self):
         self.get_agent_data()["location"] = "office"
         self.get_agent_data()["is_working"] = True
@@ -50,13 +97,15 @@ class Agent:
     async def check_email(self):
         emails = self.env.check_email(self.name)
         if emails:
-            self.env.print_formatted(self.name, f"{self.name} has {len(emails)} unread email(s).")
+            remaining = self.env.count_unread_emails(self.name)
+            self.env.print_formatted(self.name, f"{self.name} has {len(emails) + remaining} unread email(s).")
+            for email in emails:
+                self.actions.append(f"Received email from {email['sender']}: '{email['subject']}' {email['body']}")
         else:
             self.env.print_formatted(self.name, f"{self.name} has no unread emails.")
 
     async def review_tasks(self):
         self.env.print_formatted(self.name, f"{self.name} is reviewing their tasks for the day.")
-        await asyncio.sleep(1)
         self.think()
 
     async def wrap_up_tasks(self):
@@ -65,37 +114,68 @@ class Agent:
 
     async def attend_meeting(self):
         # broadcating message to all agents
-        await self.env.broadcast_message(self.name, [agent.name for agent in self.env.agents], f"{self.name} is attending a meeting.")
+        await self.env.broadcast_message(self.name, f"{self.name} is attending a meeting.", priority=CHATTER)
         await self.generate_message(self.env.agents[0])
         self.env.print_formatted(self.name, f"{self.name} is attending a meeting.")
-        await asyncio.sleep(1)
 
     async def collaborate_with_team(self):
+        # One exchange with each neighbour in the team topology. Replies arrive in the
+        # neighbours' inboxes and are read by their actors, so there is nothing to poll for.
         self.env.print_formatted(self.name, f"{self.name} is collaborating with their team.")
-        # add real time collaboration with having multiple agents talking to each other
-        while True:
-            for agent in self.env.agents:
-                if agent != self:
-                    message = await self.generate_message(agent)
-                    await self.env.send_message(self.name, agent.name, message)
-            await asyncio.sleep(1)
+        teammates = self.env.neighbours(self.name)
+        messages = await self.generate_messages(teammates)
+        for agent in teammates:
+            await self.env.send_message(self.name, agent.name, messages[agent.name], CHATTER)
 
     async def work_on_projects(self):
         self.env.print_formatted(self.name, f"{self.name} is working on their projects.")
-        await asyncio.sleep(1)
 
     def should_take_break(self):
         return self.get_agent_data()["is_working"] and len(self.actions) % 5 == 0
 
     async def take_break(self):
         self.env.print_formatted(self.name, f"{self.name} is taking a break.")
-        await asyncio.sleep(1)
 
     async def generate_message(self, recipient):
         context = f"{self.name} needs to send a message to {recipient.name}."
         message = await self.call_api(context)
         return message
 
+    async def generate_messages(self, recipients):
+        """
+        Generate one message for each recipient with a single structured LLM call.
+
+        Recipients missing from the response, or all of them if the response cannot be
+        parsed, fall back to individual generate_message() calls.
+
+        Args:
+            recipients (list): The Agents to write to.
+
+        Returns:
+            dict: Message text keyed by recipient name.
+        """
+        if not recipients:
+            return {}
+        names = [recipient.name for recipient in recipients]
+        context = f"{self.name} needs to send a message to each of these team members: {', '.join(names)}. Write one message per recipient, keyed by their name."
+        schema = {
+            "type": "object",
+            "properties": {name: {"type": "string"} for name in names},
+            "required": names,
+        }
+        try:
+            response = await self.call_api(context, json_schema=schema)
+        except StructuredOutputError as e:
+            self.env.print_formatted('System', f"{self.name}'s batched messages were malformed ({e}); generating them one by one.")
+            response = {}
+
+        messages = {name: response[name] for name in names if isinstance(response.get(name), str) and response[name].strip()}
+        missing = [recipient for recipient in recipients if recipient.name not in messages]
+        if missing:
+            fallback = await asyncio.gather(*[self.generate_message(recipient) for recipient in missing])
+            messages.update(zip([recipient.name for recipient in missing], fallback))
+        return messages
+
     def should_share_file(self, recipient):
         return self.get_agent_data()["is_working"] and len(self.actions) % 3 == 0
 
@@ -113,8 +193,8 @@ class Agent:
     async def think(self):
         context = f"""
         {self.name}, reflect on your recent actions and interactions:
-        - Actions: {', '.join(self.actions)} 
-        - Thoughts: {', '.join(self.thoughts)}
+        - Actions: {self.actions.render(', ')} 
+        - Thoughts: {self.thoughts.render(', ')}
 
         Based on your responsibilities as a {self.role} and the current project status, consider:
         - What are the most pressing priorities and challenges?
@@ -124,9 +204,30 @@ class Agent:
 
         Analyze the situation and share your ideas and recommendations. Provide specific next steps and explain your reasoning.
         """
-        thought = await self.call_api(context)
-        self.thoughts.append(thought)
-        summary = await self.generate_summary(thought)
+        # Each team digest is shown once, in the first prompt after it was written.
+        digest = self.env.latest_digest
+        if digest and digest["id"] != self.digest_id:
+            self.digest_id = digest["id"]
+            context += f"""
+        Team digest #{digest["id"]} (after round {digest["round"]}):
+        {digest["content"]}
+        """
+        fused = None
+        if FUSED_CALLS:
+            fused = await self.call_fused(context + """
+        Return your full reflection as "thought" and a concise summary of its key points, focused on decisions, problems and collaboration, as "summary".
+        """, THOUGHT_SCHEMA)
+
+        if fused:
+            thought, summary = fused["thought"], fused["summary"].strip()
+            self.thoughts.append(thought)
+        else:
+            if STREAM_RESPONSES:
+                thought = await self.stream_api(context)
+            else:
+                thought = await self.call_api(context)
+            self.thoughts.append(thought)
+            summary = await self.generate_summary(thought)
         self.env.print_formatted(self.name, f"{self.name}'s current thoughts: {summary}")
         return thought
 
@@ -147,11 +248,35 @@ class Agent:
 
             Your action should demonstrate your expertise as a {self.role} and help drive the project forward. Focus on delivering value and enabling effective collaboration.
             """
-            action = await self.call_api(context)
-            self.actions.append(action)
-            evaluation = await self.evaluate_impact(action)
-            self.env.print_formatted(self.name, f"{self.name}'s action: {action}")
+            self.action_items = []
+            self.action_tasks = []
+            fused = None
+            if FUSED_CALLS:
+                fused = await self.call_fused(context + """
+            Return your action, including any action items on their own lines, as "action", and an evaluation of its impact, feasibility, risks and alternatives as "evaluation".
+            """, ACTION_SCHEMA)
+
+            streamed = STREAM_RESPONSES and not fused
+            if fused:
+                action, evaluation = fused["action"], fused["evaluation"].strip()
+                for line in action.splitlines():
+                    self.collect_action_item(line)
+                self.actions.append(action)
+            else:
+                if streamed:
+                    action = await self.stream_api(context, on_line=self.collect_action_item)
+                else:
+                    action = await self.call_api(context)
+                    for line in action.splitlines():
+                        self.collect_action_item(line)
+                self.actions.append(action)
+                evaluation = await self.evaluate_impact(action)
+            if not streamed:
+                self.env.print_formatted(self.name, f"{self.name}'s action: {action}")
             self.env.print_formatted(self.name, f"{self.name}'s action evaluation: {evaluation}")
+            if self.action_tasks:
+                await asyncio.gather(*self.action_tasks)
+                self.action_tasks = []
         else:
             self.env.print_formatted(self.name, f"{self.name} has no thoughts to act upon.", border_style="*")
 
@@ -208,33 +333,68 @@ class Agent:
         evaluation = await self.call_api(evaluation_prompt)
         return evaluation.strip()
 
-    async def call_api(self, context):
-        return await self.api_integrations.call_api(context)
+    async def call_api(self, context, json_schema=None):
+        return await self.api_integrations.call_api(context, json_schema)
+
+    async def call_fused(self, context, schema):
+        # A fused step that still fails validation after its retries falls back
+        # to the separate calls, so FUSED_CALLS never loses a turn.
+        try:
+            return await self.call_api(context, json_schema=schema)
+        except StructuredOutputError as e:
+            self.env.print_formatted('System', f"{self.name}'s fused response was malformed ({e}); falling back to separate calls.")
+            return None
 
-    def create_file(self, file_name, content):
-        self.env.create_file(self.name, file_name, content)
+    async def stream_api(self, context, on_line=None):
+        # Render the response line by line while it streams in and hand each
+        # complete line to on_line without waiting for the rest.
+        buffer = LineBuffer()
+        chunks = []
+        async for chunk in self.api_integrations.stream_api(context):
+            chunks.append(chunk)
+            for line in buffer.feed(chunk):
+                self.handle_streamed_line(line, on_line)
+        for line in buffer.flush():
+            self.handle_streamed_line(line, on_line)
+        return "".join(chunks)
+
+    def handle_streamed_line(self, line, on_line):
+        self.env.print_stream_line(self.name, line)
+        if on_line:
+            on_line(line)
+
+    def collect_action_item(self, line):
+        # Each action item starts executing as soon as its line is complete; act()
+        # waits for all of them before the turn ends.
+        item = parse_action_item(line)
+        if item:
+            self.action_items.append(item)
+            self.action_tasks.append(asyncio.create_task(self.env.dispatcher.dispatch(self, item)))
+
+    async def create_file(self, file_name, content):
+        await self.env.create_file(self.name, file_name, content)
     
-    def read_file(self, file_name):
-        return self.env.read_file(self.name, file_name)
+    async def read_file(self, file_name):
+        return await self.env.read_file(self.name, file_name)
 
-    def update_file(self, file_name, content):
-        self.env.update_file(self.name, file_name, content)
+    async def update_file(self, file_name, content):
+        await self.env.update_file(self.name, file_name, content)
 
-    def delete_file(self, file_name):
-        self.env.delete_file(self.name, file_name)
+    async def delete_file(self, file_name):
+        await self.env.delete_file(self.name, file_name)
     
-    def create_folder(self, folder_name):
-        self.env.create_folder(self.name, folder_name)
+    async def create_folder(self, folder_name):
+        await self.env.create_folder(self.name, folder_name)
 
-    def list_folder_contents(self, folder_name):
-        return self.env.list_folder_contents(self.name, folder_name)
+    async def list_folder_contents(self, folder_name):
+        return await self.env.list_folder_contents(self.name, folder_name)
     
     async def scrape_webpage(self, url):
         scraped_data = self.env.scrape_webpage(url)
         if scraped_data:
             file_name = f"{self.name}_scraped_data.txt"
             content = self.format_scraped_data(scraped_data)
-            self.env.save_workspace_file(self.name, file_name, content)
+            await self.env.save_workspace_file(self.name, file_name, content)
             self.env.print_formatted(self.name, f"Scraped data saved to {file_name}")
         else:
             self.env.print_formatted(self.name, "Failed to scrape webpage.")
@@ -253,15 +413,15 @@ class Agent:
         return formatted_data
 
     async def save_file(self, file_path, content):
-        result = save_file(file_path, content)
+        result = await self.env.save_file(file_path, content)
         self.env.print_formatted(self.name, result)
 
     async def edit_file(self, file_path, old_content, new_content):
-        result = edit_file(file_path, old_content, new_content)
+        result = await self.env.edit_file(file_path, old_content, new_content)
         self.env.print_formatted(self.name, result)
 
     async def search_files(self, directory, keyword):
-        result = search_files(directory, keyword)
+        result = await self.env.search_files(self.name, keyword, directory)
         self.env.print_formatted(self.name, result)
     async def create_github_repo(self, repo_name, api_key):
         url = "https://api.github.com/user/repos"
@@ -274,6 +434,7 @@ class Agent:
             "description": f"Repository for {self.name}",
             "private": False
         }
+        import requests
         response = requests.post(url, headers=headers, json=data)
         if response.status_code == 201:
             repo_url = response.json()["clone_url"]
@@ -288,35 +449,35 @@ class Agent:
             self.env.print_formatted(self.name, f"API response: {response.text}")
             return None
     async def git_clone(self, repository_url, target_directory):
-        result = git_clone(repository_url, target_directory)
+        result = await self.env.skill_runner.run('git_clone', repository_url, target_directory)
         self.env.print_formatted(self.name, result)
 
     async def git_pull(self, repository_path):
-        result = git_pull(repository_path)
+        result = await self.env.skill_runner.run('git_pull', repository_path)
         self.env.print_formatted(self.name, result)
 
     async def git_push(self, repository_path, commit_message):
-        result = git_push(repository_path, commit_message)
+        result = await self.env.skill_runner.run('git_push', repository_path, commit_message)
         self.env.print_formatted(self.name, result)
 
     async def analyze_code(self, code_file):
-        result = analyze_code(code_file)
+        result = await self.env.skill_runner.run('analyze_code', code_file)
         self.env.print_formatted(self.name, result)
 
     async def check_code_quality(self, file_path):
-        result = check_code_quality(file_path)
+        result = await self.env.skill_runner.run('check_code_quality', file_path)
         self.env.print_formatted(self.name, result)
 
     async def install_dependencies(self, requirements_file):
-        result = install_dependencies(requirements_file)
+        result = await self.env.skill_runner.run('install_dependencies', requirements_file)
         self.env.print_formatted(self.name, result)
 
     async def generate_documentation(self, code_directory, output_file):
-        result = generate_documentation(code_directory, output_file)
+        result = await self.env.skill_runner.run('generate_documentation', code_directory, output_file)
         self.env.print_formatted(self.name, result)
 
     async def run_unit_tests(self, test_directory):
-        result = run_unit_tests(test_directory)
+        result = await self.env.skill_runner.run('run_unit_tests', test_directory)
         self.env.print_formatted(self.name, result)
     async def add_file_to_repo(self, repo_path, file_path, commit_message, api_key):
         url = f"https://api.github.com/repos/{self.name.lower()}/{repo_path}/contents/{file_path}"
@@ -330,6 +491,7 @@ class Agent:
             "message": commit_message,
             "content": content
         }
+        import requests
         response = requests.put(url, headers=headers, json=data)
         if response.status_code == 201:
             self.env.print_formatted(self.name, f"Added file to GitHub repository: {file_path}")
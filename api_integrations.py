@@ -1,186 +1,332 @@
 import asyncio
-import random
-from time import sleep
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain.llms.base import LLM
-from groq import Groq
-from openai import OpenAI
-import ollama
-import anthropic
-from config import AGENT_MESSAGES, groq_api_key, claude_api_key
-
-class GroqLLM(LLM):
-    def __init__(self, api_key):
-        self.api_key = api_key
-
-    def _call(self, prompt, stop=None):
-        client = Groq(api_key=self.api_key)
-        response = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            model="mixtral-8x7b-32768",
-            temperature=0.7,
-            max_tokens=32768,
-        )
-        return response.choices[0].message.content
+import json
+import time
+from config import (
+    AGENT_MESSAGES, LLM_SETTINGS, LLM_MAX_RETRIES, LLM_RETRY_BASE_DELAY, STRUCTURED_OUTPUT_RETRIES, groq_api_key, claude_api_key,
+    CLIENT_POOL_SIZE, CLIENT_KEEPALIVE_CONNECTIONS, CLIENT_TIMEOUT
+)
+from metrics import llm_metrics
+from mock_provider import MockLLMClient
+from llm_cache import get_response_cache
+from rate_limiter import get_rate_limiter, concurrency_slot, estimate_tokens
+from structured_output import StructuredOutputError, parse_structured
+
+# Provider SDKs (and httpx, langchain) are imported when a client for them is first
+# created, so starting up only loads the provider that api_choice selects.
+# Provider clients are shared by every agent in the process, keyed by provider and
+# credentials, so a large team reuses one keep-alive connection pool.
+_http_clients = {}
+_clients = {}
+
+def get_http_client(asynchronous=True):
+    if asynchronous not in _http_clients:
+        import httpx
+        limits = httpx.Limits(max_connections=CLIENT_POOL_SIZE, max_keepalive_connections=CLIENT_KEEPALIVE_CONNECTIONS)
+        client_class = httpx.AsyncClient if asynchronous else httpx.Client
+        _http_clients[asynchronous] = client_class(limits=limits, timeout=CLIENT_TIMEOUT)
+    return _http_clients[asynchronous]
+
+def get_client(provider, api_key=None):
+    key = (provider, api_key)
+    if key not in _clients:
+        if provider == "groq":
+            from groq import AsyncGroq
+            client = AsyncGroq(api_key=api_key, http_client=get_http_client())
+        elif provider == "groq_sync":
+            from groq import Groq
+            client = Groq(api_key=api_key, http_client=get_http_client(asynchronous=False))
+        elif provider == "openai":
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=api_key, http_client=get_http_client())
+        elif provider == "ollama":
+            # ollama builds its own httpx client, so only the pool limits can be shared.
+            import httpx
+            import ollama
+            limits = httpx.Limits(max_connections=CLIENT_POOL_SIZE, max_keepalive_connections=CLIENT_KEEPALIVE_CONNECTIONS)
+            client = ollama.AsyncClient(limits=limits, timeout=CLIENT_TIMEOUT)
+        elif provider == "claude":
+            import anthropic
+            client = anthropic.AsyncAnthropic(api_key=api_key, http_client=get_http_client())
+        elif provider == "mock":
+            client = MockLLMClient()
+        else:
+            raise ValueError(f"Invalid API choice: {provider}")
+        _clients[key] = client
+    return _clients[key]
+
+async def close_clients():
+    for (provider, _), client in _clients.items():
+        if provider == "ollama":
+            await client._client.aclose()
+    for asynchronous, http_client in _http_clients.items():
+        if asynchronous:
+            await http_client.aclose()
+        else:
+            http_client.close()
+    _clients.clear()
+    _http_clients.clear()
+
+_groq_llm_class = None
+
+def get_groq_llm_class():
+    """Define the langchain LLM wrapper for Groq on first use, so langchain is only imported for api_choice "langchain"."""
+    global _groq_llm_class
+    if _groq_llm_class is None:
+        from langchain.llms.base import LLM
+
+        class GroqLLM(LLM):
+            api_key: str
+
+            def _call(self, prompt, stop=None):
+                client = get_client("groq_sync", self.api_key)
+                response = client.chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    model="mixtral-8x7b-32768",
+                    temperature=0.7,
+                    max_tokens=32768,
+                )
+                return response.choices[0].message.content
+
+            @property
+            def _identifying_params(self):
+                return {"api_key": self.api_key}
 
-    @property
-    def _identifying_params(self):
-        return {"api_key": self.api_key}
-    
-    @property
-    def _llm_type(self):
-        return "groq"
+            @property
+            def _llm_type(self):
+                return "groq"
+
+        _groq_llm_class = GroqLLM
+    return _groq_llm_class
 
 class APIIntegrations:
     def __init__(self, api_choice, agent_data):
         self.api_choice = api_choice
         self.agent_data = agent_data
+        self.settings = LLM_SETTINGS.get(api_choice, {})
        
         if api_choice == "groq":
-            self.client = Groq(api_key=groq_api_key)
+            self.client = get_client("groq", groq_api_key)
         elif api_choice == "openai":
-            self.client = OpenAI()
+            self.client = get_client("openai")
         elif api_choice == "ollama":
-            self.client = ollama
+            self.client = get_client("ollama")
         elif api_choice == "langchain":
             self.client = None
         elif api_choice == "claude":
-            self.client = anthropic.Anthropic(api_key=claude_api_key)
+            self.client = get_client("claude", claude_api_key)
+        elif api_choice == "mock":
+            self.client = get_client("mock")
         else:
             raise ValueError(f"Invalid API choice: {api_choice}")
 
-    async def call_api(self, context):
+    def build_messages(self, context, json_schema=None):
+        system_message = AGENT_MESSAGES["system"]["default"].format(
+            name=self.agent_data["name"],
+            role=self.agent_data["role"],
+            responsibilities=self.agent_data["responsibilities"],
+            skills=', '.join(self.agent_data["skills"]),
+            location=self.agent_data["location"],
+            actions=self.agent_data["actions"].render(', '),
+            thoughts=self.agent_data["thoughts"].render(' '),
+            working_status='working on the project' if self.agent_data["is_working"] else 'not actively working on the project',
+            context=context
+        )
+        if json_schema is None:
+            user_message = AGENT_MESSAGES["user"]["default"].format(context=context)
+        else:
+            user_message = AGENT_MESSAGES["user"]["structured"].format(context=context, schema=json.dumps(json_schema))
+        return system_message, user_message
+
+    async def call_api(self, context, json_schema=None):
+        """
+        Complete context with the configured provider.
+
+        With a json_schema the response is parsed and validated, and re-requested up to
+        STRUCTURED_OUTPUT_RETRIES times if it does not match; StructuredOutputError is
+        raised once the retries are used up. Only valid responses are cached.
+
+        Returns:
+            str or dict: The response text, or the validated object if json_schema is given.
+        """
+        system_message, user_message = self.build_messages(context, json_schema)
+        cache = get_response_cache()
+        if cache:
+            cache_key = cache.make_key(self.api_choice, self.settings.get('model'), self.settings.get('temperature'), [system_message, user_message])
+            cached_response = cache.get(cache_key)
+            if cached_response is not None:
+                return parse_structured(cached_response, json_schema) if json_schema else cached_response
+
+        if json_schema is None:
+            response = await self.request(system_message, user_message)
+            result = response
+        else:
+            request_message = user_message
+            for attempt in range(STRUCTURED_OUTPUT_RETRIES + 1):
+                response = await self.request(system_message, request_message, json_mode=True)
+                try:
+                    result = parse_structured(response, json_schema)
+                    break
+                except StructuredOutputError as e:
+                    if attempt == STRUCTURED_OUTPUT_RETRIES:
+                        raise
+                    request_message = f"{user_message}\nYour previous response was rejected because {e}. Reply again with only the JSON object."
+
+        if cache:
+            cache.put(cache_key, response)
+        return result
+
+    async def request(self, system_message, user_message, json_mode=False):
+        rate_limiter = get_rate_limiter(self.api_choice)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                async with concurrency_slot(self.api_choice):
+                    await rate_limiter.acquire(estimate_tokens(system_message) + estimate_tokens(user_message))
+                    start = time.perf_counter()
+                    response = await self.dispatch(system_message, user_message, json_mode)
+                    llm_metrics.record(time.perf_counter() - start)
+                break
+            except Exception as e:
+                llm_metrics.record_error()
+                if getattr(e, 'status_code', None) != 429 or attempt == LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(LLM_RETRY_BASE_DELAY * 2 ** attempt)
+
+        rate_limiter.record_usage(estimate_tokens(response))
+        return response
+
+    async def stream_api(self, context):
+        """Yield the completion for context in chunks as the provider produces them."""
+        system_message, user_message = self.build_messages(context)
+        cache = get_response_cache()
+        if cache:
+            cache_key = cache.make_key(self.api_choice, self.settings.get('model'), self.settings.get('temperature'), [system_message, user_message])
+            cached_response = cache.get(cache_key)
+            if cached_response is not None:
+                yield cached_response
+                return
+
+        rate_limiter = get_rate_limiter(self.api_choice)
+        chunks = []
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                async with concurrency_slot(self.api_choice):
+                    await rate_limiter.acquire(estimate_tokens(system_message) + estimate_tokens(user_message))
+                    start = time.perf_counter()
+                    first_token_latency = None
+                    async for chunk in self.dispatch_stream(system_message, user_message):
+                        if not chunk:
+                            continue
+                        if first_token_latency is None:
+                            first_token_latency = time.perf_counter() - start
+                        chunks.append(chunk)
+                        yield chunk
+                    response = "".join(chunks)
+                    llm_metrics.record(time.perf_counter() - start, first_token_latency, estimate_tokens(response))
+                break
+            except Exception as e:
+                llm_metrics.record_error()
+                # Once output has been yielded the call cannot be replayed.
+                if chunks or getattr(e, 'status_code', None) != 429 or attempt == LLM_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(LLM_RETRY_BASE_DELAY * 2 ** attempt)
+
+        rate_limiter.record_usage(estimate_tokens(response))
+        if cache:
+            cache.put(cache_key, response)
+
+    async def dispatch(self, system_message, user_message, json_mode=False):
         if self.api_choice == "groq":
-            response = await self.call_groq_api(context)
-            sleep(3)
+            return await self.call_groq_api(system_message, user_message, json_mode)
         elif self.api_choice == "openai":
-            response = await self.call_openai_api(context)
+            return await self.call_openai_api(system_message, user_message, json_mode)
         elif self.api_choice == "ollama":
-            response = await self.ollama_local_server_api(context)
+            return await self.ollama_local_server_api(system_message, user_message, json_mode)
         elif self.api_choice == "langchain":
-            response = await self.call_langchain_api(context)
+            return await self.call_langchain_api(system_message, user_message)
         elif self.api_choice == "claude":
-            response = await self.call_claude_api(context)
+            return await self.call_claude_api(system_message, user_message)
+        elif self.api_choice == "mock":
+            return await self.call_mock_api(system_message, user_message)
         else:
             raise ValueError(f"Invalid API choice: {self.api_choice}")
-        sleep(3)
-        return response
 
-    async def call_groq_api(self, context):
-        def run_groq_api():
-            system_message = AGENT_MESSAGES["system"]["default"].format(
-                name=self.agent_data["name"],
-                role=self.agent_data["role"],
-                responsibilities=self.agent_data["responsibilities"],
-                skills=', '.join(self.agent_data["skills"]),
-                location=self.agent_data["location"],
-                actions=', '.join(self.agent_data["actions"]),
-                thoughts=' '.join(map(str, self.agent_data["thoughts"])),
-                working_status='working on the project' if self.agent_data["is_working"] else 'not actively working on the project',
-                context=context
-            )
-            user_message = AGENT_MESSAGES["user"]["default"].format(context=context)
-            model = random.choice(["llama2-70b-4096", "gemma-7b-it", "mixtral-8x7b-32768"])
-            temp = random.uniform(0.1, 0.9)
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
-                model="mixtral-8x7b-32768",
-                temperature=temp,
-                max_tokens=32768,
-            )
-            return chat_completion
-        chat_completion = await asyncio.to_thread(run_groq_api)
-        response = chat_completion.choices[0].message.content
-        sleep(5)
-        return response
+    async def dispatch_stream(self, system_message, user_message):
+        if self.api_choice in ("groq", "openai"):
+            stream = self.stream_chat_completion(system_message, user_message)
+        elif self.api_choice == "ollama":
+            stream = self.stream_ollama_local_server_api(system_message, user_message)
+        elif self.api_choice == "claude":
+            stream = self.stream_claude_api(system_message, user_message)
+        elif self.api_choice == "mock":
+            stream = self.client.stream(system_message, user_message)
+        else:
+            # Providers without a streaming API deliver the whole response as one chunk.
+            yield await self.dispatch(system_message, user_message)
+            return
+        async for chunk in stream:
+            yield chunk
 
-    async def call_openai_api(self, context):
-        system_message = AGENT_MESSAGES["system"]["default"].format(
-            name=self.agent_data["name"],
-            role=self.agent_data["role"],
-            responsibilities=self.agent_data["responsibilities"],
-            skills=', '.join(self.agent_data["skills"]),
-            location=self.agent_data["location"],
-            actions=', '.join(self.agent_data["actions"]),
-            thoughts=' '.join(map(str, self.agent_data["thoughts"])),
-            working_status='working on the project' if self.agent_data["is_working"] else 'not actively working on the project',
-            context=context
+    async def call_groq_api(self, system_message, user_message, json_mode=False):
+        options = {"response_format": {"type": "json_object"}} if json_mode else {}
+        chat_completion = await self.client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message}
+            ],
+            model=self.settings["model"],
+            temperature=self.settings["temperature"],
+            max_tokens=self.settings["max_tokens"],
+            **options
         )
-        user_message = AGENT_MESSAGES["user"]["default"].format(context=context)
-        response = self.client.chat.completions.create(
-            model="gpt-4-0125-preview",
+        return chat_completion.choices[0].message.content
+
+    async def call_openai_api(self, system_message, user_message, json_mode=False):
+        options = {"temperature": self.settings["temperature"]} if self.settings.get("temperature") is not None else {}
+        if json_mode:
+            options["response_format"] = {"type": "json_object"}
+        response = await self.client.chat.completions.create(
+            model=self.settings["model"],
             messages=[
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": user_message}
-            ]
+            ],
+            **options
         )
         return response.choices[0].message.content
 
-    async def ollama_local_server_api(self, context):
-        system_message = AGENT_MESSAGES["system"]["default"].format(
-            name=self.agent_data["name"],
-            role=self.agent_data["role"],
-            responsibilities=self.agent_data["responsibilities"],
-            skills=', '.join(self.agent_data["skills"]),
-            location=self.agent_data["location"],
-            actions=', '.join(self.agent_data["actions"]),
-            thoughts=' '.join(map(str, self.agent_data["thoughts"])),
-            working_status='working on the project' if self.agent_data["is_working"] else 'not actively working on the project',
-            context=context
-        )
-        user_message = AGENT_MESSAGES["user"]["default"].format(context=context)
-        response = self.client.chat(
-            model="mistral",
+    async def ollama_local_server_api(self, system_message, user_message, json_mode=False):
+        options = {"temperature": self.settings["temperature"]} if self.settings.get("temperature") is not None else None
+        response = await self.client.chat(
+            model=self.settings["model"],
             messages=[
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": user_message}
-            ]
+            ],
+            options=options,
+            format="json" if json_mode else ""
         )
         return response['message']['content']
 
-    async def call_langchain_api(self, context):
+    async def call_langchain_api(self, system_message, user_message):
+        from langchain.chains import LLMChain
+        from langchain.prompts import PromptTemplate
         prompt_template = PromptTemplate(
-            input_variables=["context", "name", "role", "responsibilities", "skills", "location", "actions", "thoughts", "working_status"],
-            template=AGENT_MESSAGES["system"]["default"] + "\n\n" + AGENT_MESSAGES["user"]["default"],
+            input_variables=["system_message", "user_message"],
+            template="{system_message}\n\n{user_message}",
         )
-        groq_llm = GroqLLM(api_key=groq_api_key)
+        groq_llm = get_groq_llm_class()(api_key=groq_api_key)
         chain = LLMChain(llm=groq_llm, prompt=prompt_template)
-        response = chain.run(
-            context=context,
-            name=self.agent_data["name"],
-            role=self.agent_data["role"],
-            responsibilities=self.agent_data["responsibilities"],
-            skills=', '.join(self.agent_data["skills"]),
-            location=self.agent_data["location"],
-            actions=', '.join(self.agent_data["actions"]),
-            thoughts=' '.join(map(str, self.agent_data["thoughts"])),
-            working_status='working on the project' if self.agent_data["is_working"] else 'not actively working on the project'
-        )
+        response = await asyncio.to_thread(chain.run, system_message=system_message, user_message=user_message)
         return response
-    async def call_claude_api(self, context):
-        system_message = AGENT_MESSAGES["system"]["default"].format(
-            name=self.agent_data["name"],
-            role=self.agent_data["role"],
-            responsibilities=self.agent_data["responsibilities"],
-            skills=', '.join(self.agent_data["skills"]),
-            location=self.agent_data["location"],
-            actions=', '.join(self.agent_data["actions"]),
-            thoughts=' '.join(map(str, self.agent_data["thoughts"])),
-            working_status='working on the project' if self.agent_data["is_working"] else 'not actively working on the project',
-            context=context
-        )
-        user_message = AGENT_MESSAGES["user"]["default"].format(context=context)
-        response = self.client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=4000,
-            temperature=0.7,
+
+    async def call_claude_api(self, system_message, user_message):
+        response = await self.client.messages.create(
+            model=self.settings["model"],
+            max_tokens=self.settings["max_tokens"],
+            temperature=self.settings["temperature"],
             system=system_message,
             messages=[
                 {
@@ -192,25 +338,60 @@ class APIIntegrations:
         
         return response.content[0].text
 
-    async def call_local_LM_studio_API_server(self, context):
-  
-            system_message = AGENT_MESSAGES["system"]["default"].format(
-                name=self.agent_data["name"],
-                role=self.agent_data["role"],
-                responsibilities=self.agent_data["responsibilities"],
-                skills=', '.join(self.agent_data["skills"]),
-                location=self.agent_data["location"],
-                actions=', '.join(self.agent_data["actions"]),
-                thoughts=' '.join(map(str, self.agent_data["thoughts"])),
-                working_status='working on the project' if self.agent_data["is_working"] else 'not actively working on the project',
-                context=context
-            )
-            user_message = AGENT_MESSAGES["user"]["default"].format(context=context)
-            response = self.client.chat.completions.create(
-                model="mistral",
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ]
-            )
-            return response.choices[0].message.content
+    async def stream_chat_completion(self, system_message, user_message):
+        options = {key: self.settings[key] for key in ("temperature", "max_tokens") if self.settings.get(key) is not None}
+        stream = await self.client.chat.completions.create(
+            model=self.settings["model"],
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message}
+            ],
+            stream=True,
+            **options
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def stream_ollama_local_server_api(self, system_message, user_message):
+        options = {"temperature": self.settings["temperature"]} if self.settings.get("temperature") is not None else None
+        stream = await self.client.chat(
+            model=self.settings["model"],
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message}
+            ],
+            options=options,
+            stream=True
+        )
+        async for part in stream:
+            yield part['message']['content']
+
+    async def stream_claude_api(self, system_message, user_message):
+        async with self.client.messages.stream(
+            model=self.settings["model"],
+            max_tokens=self.settings["max_tokens"],
+            temperature=self.settings["temperature"],
+            system=system_message,
+            messages=[
+                {
+                    "role": "user",
+                    "content": user_message
+                }
+            ]
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+    async def call_mock_api(self, system_message, user_message):
+        return await self.client.complete(system_message, user_message)
+
+    async def call_local_LM_studio_API_server(self, system_message, user_message):
+        response = await self.client.chat.completions.create(
+            model="mistral",
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message}
+            ]
+        )
+        return response.choices[0].message.content
@@ -0,0 +1,542 @@
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+def start_stub_llm_server(latency):
+    """
+    Start a local OpenAI-compatible chat completions server that answers every request after a fixed delay.
+
+    Args:
+        latency (float): Seconds to wait before answering each request.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() when done.
+    """
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            body = json.dumps({
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "message|Alice|Stub response."}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class StubServer(ThreadingHTTPServer):
+        request_queue_size = 256
+
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def benchmark_concurrent_calls(num_agents, latency):
+    """
+    Measure whether concurrent LLM calls from several agents overlap their network waits.
+
+    Args:
+        num_agents (int): Number of agents calling the stub server at the same time.
+        latency (float): Per-request latency of the stub server in seconds.
+
+    Returns:
+        dict: Wall time of the concurrent batch compared with the sequential lower bound.
+    """
+    from api_integrations import APIIntegrations, close_clients
+    from memory import AgentMemory
+
+    server = start_stub_llm_server(latency)
+    # The OpenAI client picks these up, so the real provider code path talks to the stub.
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    # Measure overlap only; the provider quota would otherwise dominate larger batches.
+    config.RATE_LIMITS["openai"] = {}
+    try:
+        integrations = []
+        for agent_config in (config.AGENTS * (num_agents // len(config.AGENTS) + 1))[:num_agents]:
+            agent_data = dict(agent_config, actions=AgentMemory(), thoughts=AgentMemory(), location="office", is_working=True)
+            integrations.append(APIIntegrations("openai", agent_data))
+
+        start = time.perf_counter()
+        await asyncio.gather(*[api.call_api("Status update.") for api in integrations])
+        wall_time = time.perf_counter() - start
+    finally:
+        await close_clients()
+        server.shutdown()
+
+    return {
+        "agents": num_agents,
+        "latency": latency,
+        "wall_time": round(wall_time, 3),
+        "sequential_time": round(num_agents * latency, 3),
+        "overlapped": wall_time < 2 * latency,
+    }
+
+def benchmark_database_inserts(count):
+    """
+    Compare chat message inserts per second with a connection per call versus the shared connection manager.
+
+    Args:
+        count (int): Number of single-row transactions to run for each strategy.
+
+    Returns:
+        dict: Inserts per second for both strategies.
+    """
+    from database import ConnectionManager
+
+    row = ("Alice", "Bob", "Benchmark message " * 10, "2024-01-01T00:00:00")
+    create_table = "CREATE TABLE IF NOT EXISTS messages (sender TEXT, recipients TEXT, message TEXT, timestamp TEXT)"
+    with tempfile.TemporaryDirectory() as database_dir:
+        path = os.path.join(database_dir, "chat_history.db")
+        conn = sqlite3.connect(path)
+        conn.execute(create_table)
+        conn.close()
+        start = time.perf_counter()
+        for _ in range(count):
+            conn = sqlite3.connect(path)
+            conn.execute("INSERT INTO messages VALUES (?, ?, ?, ?)", row)
+            conn.commit()
+            conn.close()
+        per_call = count / (time.perf_counter() - start)
+
+        manager = ConnectionManager(database_dir=database_dir, consolidate=False)
+        conn = manager.connect("chat")
+        conn.execute("DELETE FROM messages")
+        conn.commit()
+        start = time.perf_counter()
+        for _ in range(count):
+            with manager.connect("chat") as conn:
+                conn.execute("INSERT INTO messages VALUES (?, ?, ?, ?)", row)
+        pooled = count / (time.perf_counter() - start)
+        manager.close_all()
+
+    return {
+        "inserts": count,
+        "connection_per_call_inserts_per_sec": round(per_call),
+        "connection_manager_inserts_per_sec": round(pooled),
+        "speedup": round(pooled / per_call, 1),
+    }
+
+@contextlib.contextmanager
+def isolated_workdir():
+    # Databases and workspaces are created relative to the working directory.
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            yield workdir
+        finally:
+            os.chdir(previous)
+
+def benchmark_search(count, queries, limit=20):
+    """
+    Compare FTS5 chat search with the LIKE scan it replaced.
+
+    Args:
+        count (int): Number of generated paragraphs to store.
+        queries (int): Number of keyword searches to time for each strategy.
+        limit (int): Results requested per query.
+
+    Returns:
+        dict: Average milliseconds per query for both strategies.
+    """
+    import database
+
+    # Zipf-distributed vocabulary, like natural text: a few very common words and a long tail.
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(50000)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    names = [agent["name"] for agent in config.AGENTS]
+
+    with isolated_workdir():
+        database.connections = database.ConnectionManager(database_dir=database.DATABASE_DIR)
+        database.create_databases_and_folders()
+        messages = [{
+            "sender": rng.choice(names),
+            "recipients": [rng.choice(names)],
+            "message": " ".join(rng.choices(words, cum_weights=cum_weights, k=120)),
+            "ts": i,
+        } for i in range(count)]
+        database.save_chat_history(messages)
+
+        keywords = [rng.choice(words[100:]) for _ in range(queries)]
+        conn = database.get_connection('chat')
+        start = time.perf_counter()
+        for keyword in keywords:
+            conn.execute("SELECT id, sender, message, ts FROM messages WHERE message LIKE ? ORDER BY ts DESC LIMIT ?", (f'%{keyword}%', limit)).fetchall()
+        like_ms = (time.perf_counter() - start) * 1000 / queries
+
+        start = time.perf_counter()
+        for keyword in keywords:
+            database.search_chat_history(keyword, limit)
+        fts_ms = (time.perf_counter() - start) * 1000 / queries
+        database.connections.close_all()
+
+    return {
+        "messages": count,
+        "queries": queries,
+        "limit": limit,
+        "like_scan_ms_per_query": round(like_ms, 3),
+        "fts5_ms_per_query": round(fts_ms, 3),
+        "speedup": round(like_ms / fts_ms, 1),
+    }
+
+def benchmark_workspace_search(count, queries):
+    """
+    Compare workspace search through the trigram index with the directory walk of skills.search_files.
+
+    Args:
+        count (int): Number of generated source files, a few dozen lines each.
+        queries (int): Number of keyword searches to time for each strategy. Index
+            searches return at most config.WORKSPACE_SEARCH_LIMIT matches, like the
+            search_files command.
+
+    Returns:
+        dict: Index build time and average milliseconds per query for both strategies.
+    """
+    from skills import search_files
+    from workspace_index import WorkspaceIndex
+
+    rng = random.Random(0)
+    words = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz_", k=rng.randint(4, 12))) for _ in range(50000)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+    with isolated_workdir():
+        for i in range(count):
+            directory = os.path.join("workspace", f"module{i % 100}")
+            os.makedirs(directory, exist_ok=True)
+            lines = [f"def {rng.choices(words, cum_weights=cum_weights)[0]}({', '.join(rng.choices(words, cum_weights=cum_weights, k=3))}):" for _ in range(40)]
+            with open(os.path.join(directory, f"file{i}.py"), "w") as file:
+                file.write("\n".join(lines) + "\n")
+        with open(os.path.join("workspace", "image.png"), "wb") as file:
+            file.write(bytes(range(256)) * 64)
+
+        keywords = [rng.choice(words[100:]) for _ in range(queries)]
+        index = WorkspaceIndex("workspace")
+        start = time.perf_counter()
+        index.refresh()
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for keyword in keywords:
+            index.search(keyword, limit=config.WORKSPACE_SEARCH_LIMIT)
+        index_ms = (time.perf_counter() - start) * 1000 / queries
+
+        walk_queries = keywords[:max(1, queries // 10)]
+        with contextlib.redirect_stderr(open(os.devnull, "w")):
+            start = time.perf_counter()
+            for keyword in walk_queries:
+                search_files("workspace", keyword)
+            walk_ms = (time.perf_counter() - start) * 1000 / len(walk_queries)
+
+    return {
+        "files": count,
+        "queries": queries,
+        "index_build_s": round(build_s, 3),
+        "walk_ms_per_query": round(walk_ms, 3),
+        "index_ms_per_query": round(index_ms, 3),
+        "speedup": round(walk_ms / index_ms, 1),
+    }
+
+
+# Modules that must only be imported once a provider or skill that needs them is used.
+LAZY_MODULES = ("groq", "openai", "anthropic", "ollama", "langchain", "httpx", "git", "pylint", "requests", "bs4")
+
+def benchmark_imports(module, repeat):
+    """
+    Measure the cold import time of a module with python -X importtime.
+
+    Each import runs in a fresh interpreter. The fastest run is reported, so the
+    first run's bytecode compilation does not count.
+
+    Args:
+        module (str): The module to import, e.g. "main".
+        repeat (int): Number of interpreters to start.
+
+    Returns:
+        dict: The import time in milliseconds, the slowest modules it imports directly
+            and which of LAZY_MODULES it loaded.
+    """
+    code = f"import sys, json, {module}; print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))"
+    best = None
+    for _ in range(repeat):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        timings = []
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            timings.append((int(cumulative), name.strip(), (len(name) - len(name.lstrip()) - 1) // 2))
+        # Imports are listed after the modules they import, so the module's own
+        # imports are the depth-1 entries just before its depth-0 entry.
+        end = next(i for i, (_, name, depth) in enumerate(timings) if depth == 0 and name == module)
+        start = end
+        while start > 0 and timings[start - 1][2] > 0:
+            start -= 1
+        total_us = timings[end][0]
+        children = [(cumulative, name) for cumulative, name, depth in timings[start:end] if depth == 1]
+        if best is None or total_us < best[0]:
+            best = (total_us, children, json.loads(process.stdout.splitlines()[-1]))
+
+    total_us, children, loaded = best
+    slowest = sorted(children, reverse=True)[:10]
+    return {
+        "module": module,
+        "import_ms": round(total_us / 1000, 1),
+        "slowest_ms": {name: round(cumulative / 1000, 1) for cumulative, name in slowest},
+        "lazy_modules_loaded": loaded,
+    }
+
+def generate_agent_configs(num_agents):
+    """
+    Build agent configurations by cycling through the config.AGENTS templates.
+
+    Each pass through the templates is a separate team: names, managers and squads
+    get the pass's numeric suffix.
+
+    Args:
+        num_agents (int): Number of agents to generate; names get a numeric suffix after the first pass.
+
+    Returns:
+        list: Agent configuration dicts in the same shape as config.AGENTS.
+    """
+    agent_configs = []
+    for i in range(num_agents):
+        template = config.AGENTS[i % len(config.AGENTS)]
+        suffix = "" if i < len(config.AGENTS) else str(i // len(config.AGENTS) + 1)
+        agent_config = dict(template, name=f"{template['name']}{suffix}", squads=[f"{squad}{suffix}" for squad in template.get('squads', [])])
+        if template.get('reports_to'):
+            agent_config['reports_to'] = f"{template['reports_to']}{suffix}"
+        agent_configs.append(agent_config)
+    return agent_configs
+
+async def monitor_event_loop_lag(lags, interval=0.05):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, file_name)) for root, _, files in os.walk(path) for file_name in files)
+
+async def run_simulation_benchmark(num_agents, rounds, max_concurrent_llm_calls, max_concurrent_turns, mock_settings, topology_settings):
+    import api_integrations
+    import database
+    import rate_limiter
+    from agent import Agent
+    from environment import Environment
+    from metrics import llm_metrics
+    from mock_provider import MockLLMClient
+    from scheduler import TurnScheduler
+    from topology import build_topology
+
+    rate_limiter.reset_rate_limiters(max_concurrent_llm_calls)
+    api_integrations._clients[("mock", None)] = MockLLMClient(**mock_settings)
+    llm_metrics.reset()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        env = Environment()
+        agents = []
+        agent_configs = generate_agent_configs(num_agents)
+        for agent_config in agent_configs:
+            agent = Agent(agent_config['name'], agent_config['role'], agent_config['responsibilities'], agent_config['skills'], env, "mock")
+            agents.append(agent)
+            env.add_agent(agent)
+        topology = build_topology(agent_configs, topology_settings)
+        env.set_topology(topology)
+
+        lags = []
+        monitor = asyncio.create_task(monitor_event_loop_lag(lags))
+        scheduler = TurnScheduler(env, agents, max_concurrent_turns)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await scheduler.run_round()
+        wall_time = time.perf_counter() - start
+        monitor.cancel()
+        await env.stop_actors()
+        env.close()
+
+    rows = {}
+    for name, tables in (("chat", ["messages", "message_recipients"]), ("info", ["info", "digests"]), ("emails", ["emails"]), ("knowledge", ["knowledge"])):
+        conn = sqlite3.connect(database.connections.path(name))
+        for table in tables:
+            rows[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        conn.close()
+
+    call_summary = llm_metrics.summary()
+    turns = num_agents * rounds
+    return {
+        "agents": num_agents,
+        "rounds": rounds,
+        "max_concurrent_llm_calls": max_concurrent_llm_calls,
+        "max_concurrent_turns": max_concurrent_turns,
+        "mock": mock_settings,
+        "topology": topology_settings,
+        "topology_edges": topology.edge_count(),
+        "wall_time": round(wall_time, 3),
+        "turns_per_sec": round(turns / wall_time, 3),
+        "round_wall_times": [round(stats["wall_time"], 3) for stats in scheduler.round_stats],
+        "failed_turns": sum(stats["failed_turns"] for stats in scheduler.round_stats),
+        "llm_calls": call_summary["calls"],
+        "llm_calls_per_round": call_summary["calls"] / rounds,
+        "llm_errors": call_summary["errors"],
+        "llm_latency_p50": call_summary["latency_p50"],
+        "llm_latency_p95": call_summary["latency_p95"],
+        "llm_latency_p99": call_summary["latency_p99"],
+        "inbox_messages_shed": sum(agent.inbox.shed for agent in agents),
+        "inbox_messages_coalesced": sum(agent.inbox.coalesced for agent in agents),
+        "sqlite_rows": rows,
+        "sqlite_rows_written": sum(rows.values()),
+        "database_bytes": directory_size(database.DATABASE_DIR),
+        "workspace_bytes": directory_size(database.WORKSPACE_DIR),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "event_loop_lag_mean": round(sum(lags) / len(lags), 6) if lags else None,
+        "event_loop_lag_max": round(max(lags), 6) if lags else None,
+    }
+
+def benchmark_simulation(num_agents, rounds, max_concurrent_llm_calls, max_concurrent_turns=None, mock_settings=None, topology_settings=None):
+    """
+    Run N agents for M rounds of the simulation against the mock provider.
+
+    Args:
+        num_agents (int): Number of agents, generated from the config.AGENTS templates.
+        rounds (int): Number of scheduler rounds to run.
+        max_concurrent_llm_calls (int): Global cap on in-flight LLM calls.
+        max_concurrent_turns (int, optional): Cap on concurrently running agent turns.
+        mock_settings (dict, optional): Overrides for config.MOCK_PROVIDER.
+        topology_settings (dict, optional): Overrides for config.TOPOLOGY.
+
+    Returns:
+        dict: Throughput, LLM call latency percentiles, SQLite and disk usage, peak RSS and event-loop lag.
+    """
+    with isolated_workdir():
+        return asyncio.run(run_simulation_benchmark(num_agents, rounds, max_concurrent_llm_calls, max_concurrent_turns, mock_settings or {},
+                                                    dict(config.TOPOLOGY, **(topology_settings or {}))))
+
+def benchmark_sweep(agent_counts, concurrency_limits, rounds, mock_settings, topology_settings):
+    """
+    Run the simulation benchmark for every agent count and concurrency limit.
+
+    Each configuration runs in a fresh interpreter so peak RSS and global state are not shared between runs.
+
+    Returns:
+        list: One simulation result per configuration.
+    """
+    results = []
+    for num_agents in agent_counts:
+        for limit in concurrency_limits:
+            command = [sys.executable, os.path.abspath(__file__), "simulation", "--agents", str(num_agents), "--rounds", str(rounds),
+                       "--concurrency", str(limit), "--mock", json.dumps(mock_settings), "--topology", json.dumps(topology_settings)]
+            output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            results.append(json.loads(output))
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_result(result, output):
+    text = json.dumps(result, indent=2)
+    if output:
+        with open(output, "w") as file:
+            file.write(text + "\n")
+    print(text)
+
+def main():
+    parser = argparse.ArgumentParser(description="AI-TeamPlay benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    concurrency = subparsers.add_parser("concurrency", help="concurrent LLM calls against a local stub server")
+    concurrency.add_argument("--agents", type=int, default=6)
+    concurrency.add_argument("--latency", type=float, default=0.5)
+
+    database = subparsers.add_parser("database", help="SQLite inserts/sec per connection strategy")
+    database.add_argument("--inserts", type=int, default=2000)
+
+    search = subparsers.add_parser("search", help="FTS5 chat search versus LIKE scan")
+    search.add_argument("--messages", type=int, default=100000)
+    search.add_argument("--queries", type=int, default=50)
+    search.add_argument("--limit", type=int, default=20)
+
+    workspace = subparsers.add_parser("workspace", help="indexed workspace search versus directory walk")
+    workspace.add_argument("--files", type=int, default=20000)
+    workspace.add_argument("--queries", type=int, default=200)
+
+    imports = subparsers.add_parser("imports", help="cold import time of a module (fails on regression)")
+    imports.add_argument("--module", default="main")
+    imports.add_argument("--repeat", type=int, default=3)
+    imports.add_argument("--max-ms", type=float, default=500, help="fail if the import takes longer")
+
+    simulation = subparsers.add_parser("simulation", help="N agents x M rounds against the mock provider")
+    simulation.add_argument("--agents", type=int, default=6)
+    simulation.add_argument("--rounds", type=int, default=2)
+    simulation.add_argument("--concurrency", type=int, default=config.MAX_CONCURRENT_LLM_CALLS, help="max in-flight LLM calls")
+    simulation.add_argument("--turns", type=int, default=None, help="max concurrent agent turns")
+    simulation.add_argument("--mock", default="{}", help="JSON overrides for config.MOCK_PROVIDER")
+    simulation.add_argument("--topology", default="{}", help="JSON overrides for config.TOPOLOGY")
+    simulation.add_argument("--output", help="write the JSON result to this file")
+
+    sweep = subparsers.add_parser("sweep", help="simulation benchmark over agent counts and concurrency limits")
+    sweep.add_argument("--agents", type=int, nargs="+", default=[6, 50, 200])
+    sweep.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 128])
+    sweep.add_argument("--rounds", type=int, default=1)
+    sweep.add_argument("--mock", default='{"latency_ms": 20}', help="JSON overrides for config.MOCK_PROVIDER")
+    sweep.add_argument("--topology", default="{}", help="JSON overrides for config.TOPOLOGY")
+    sweep.add_argument("--output", help="write the JSON results to this file")
+
+    args = parser.parse_args()
+    if args.benchmark == "concurrency":
+        result = asyncio.run(benchmark_concurrent_calls(args.agents, args.latency))
+        print(json.dumps(result, indent=2))
+        if not result["overlapped"]:
+            raise SystemExit(1)
+    elif args.benchmark == "database":
+        print(json.dumps(benchmark_database_inserts(args.inserts), indent=2))
+    elif args.benchmark == "search":
+        print(json.dumps(benchmark_search(args.messages, args.queries, args.limit), indent=2))
+    elif args.benchmark == "workspace":
+        print(json.dumps(benchmark_workspace_search(args.files, args.queries), indent=2))
+    elif args.benchmark == "imports":
+        result = benchmark_imports(args.module, args.repeat)
+        print(json.dumps(result, indent=2))
+        if result["lazy_modules_loaded"] or result["import_ms"] > args.max_ms:
+            raise SystemExit(1)
+    elif args.benchmark == "simulation":
+        result = benchmark_simulation(args.agents, args.rounds, args.concurrency, args.turns, json.loads(args.mock), json.loads(args.topology))
+        result["revision"] = git_revision()
+        write_result(result, args.output)
+    elif args.benchmark == "sweep":
+        results = benchmark_sweep(args.agents, args.concurrency, args.rounds, json.loads(args.mock), json.loads(args.topology))
+        write_result({"revision": git_revision(), "results": results}, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -6,46 +6,232 @@ DATABASE_DIR = 'databases'
 # Workspace directory
 WORKSPACE_DIR = 'workspace'
 
+# SQLite connections are long-lived and run in WAL mode. Set CONSOLIDATE_DATABASES
+# to store emails, chat history, knowledge and important info in one file.
+CONSOLIDATE_DATABASES = False
+CONSOLIDATED_DATABASE_FILE = 'simulation.db'
+SQLITE_SYNCHRONOUS = 'NORMAL'
+SQLITE_CACHE_SIZE_KB = 16384
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# Chat messages are written behind in batches: one transaction per batch of
+# CHAT_FLUSH_BATCH_SIZE messages or every CHAT_FLUSH_INTERVAL seconds. A reader
+# waits at most CHAT_FLUSH_TIMEOUT seconds for queued messages to be written.
+CHAT_FLUSH_INTERVAL = 1.0
+CHAT_FLUSH_BATCH_SIZE = 100
+CHAT_FLUSH_TIMEOUT = 5.0
+
+# Emails are read from an indexed mailbox, at most EMAIL_FETCH_LIMIT unread emails
+# per check; the rest stay unread for the next check.
+EMAIL_FETCH_LIMIT = 20
+
 groq_api_key = ''
 claude_api_key = ''
 
+# Provider rate limits (None disables the bucket). LLM calls await capacity
+# instead of sleeping, so throughput is capped by the provider's quota.
+# max_concurrent caps in-flight calls per provider.
+RATE_LIMITS = {
+    'groq': {'requests_per_minute': 30, 'tokens_per_minute': 6000, 'max_concurrent': 4},
+    'openai': {'requests_per_minute': 500, 'tokens_per_minute': 30000, 'max_concurrent': 16},
+    'claude': {'requests_per_minute': 50, 'tokens_per_minute': 50000, 'max_concurrent': 8},
+    'langchain': {'requests_per_minute': 30, 'tokens_per_minute': 6000, 'max_concurrent': 4},
+    'ollama': {'requests_per_minute': None, 'tokens_per_minute': None, 'max_concurrent': 2},
+    'mock': {'requests_per_minute': None, 'tokens_per_minute': None, 'max_concurrent': None},
+}
+
+# Failed calls with HTTP status 429 are retried with exponential backoff.
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BASE_DELAY = 1.0
+
+# Simulation scheduling: in-flight LLM calls across all providers, agent turns
+# run concurrently per round (None means every agent at once), and the number
+# of rounds to run (None runs until interrupted).
+MAX_CONCURRENT_LLM_CALLS = 32
+MAX_CONCURRENT_TURNS = None
+SIMULATION_ROUNDS = None
+
+# Every agent runs as an actor that sleeps until its inbox has work. The inbox holds
+# at most AGENT_INBOX_SIZE envelopes; when it is full, status chatter is dropped
+# or merged into queued messages (see inbox.Inbox).
+AGENT_INBOX_SIZE = 32
+
+# Agent memory: prompt budget (estimated tokens) for an agent's actions or
+# thoughts, of which AGENT_MEMORY_SUMMARY_TOKENS hold a summary of older items.
+AGENT_MEMORY_TOKEN_BUDGET = 2000
+AGENT_MEMORY_SUMMARY_TOKENS = 500
+AGENT_MEMORY_SUMMARY_FRAGMENT_CHARS = 160
+
+# Model and sampling settings per provider. A temperature of None leaves the
+# provider default in place.
+LLM_SETTINGS = {
+    'groq': {'model': 'mixtral-8x7b-32768', 'temperature': 0.5, 'max_tokens': 32768},
+    'openai': {'model': 'gpt-4-0125-preview', 'temperature': None},
+    'ollama': {'model': 'mistral', 'temperature': None},
+    'langchain': {'model': 'mixtral-8x7b-32768', 'temperature': 0.7},
+    'claude': {'model': 'claude-3-haiku-20240307', 'temperature': 0.7, 'max_tokens': 4000},
+    'mock': {'model': 'mock', 'temperature': None},
+}
+
+# Offline mock provider (api_choice "mock") for load testing without network.
+# latency is 'fixed', 'normal' (latency_ms +/- latency_stddev_ms) or 'long_tail'
+# (exponential around latency_ms, with tail_probability of calls tail_multiplier
+# times slower). error_rate is the fraction of calls failing with a 429 and
+# malformed_rate the fraction of JSON responses that are truncated.
+# Streamed responses are emitted at stream_tokens_per_second after the first token.
+MOCK_PROVIDER = {
+    'seed': 42,
+    'latency': 'fixed',
+    'latency_ms': 200,
+    'latency_stddev_ms': 50,
+    'tail_probability': 0.05,
+    'tail_multiplier': 10,
+    'error_rate': 0.0,
+    'stream_tokens_per_second': 200,
+    'malformed_rate': 0.0,
+}
+
+# Structured (JSON) responses that fail to parse or validate are re-requested
+# this many times before the caller falls back to plain-text calls.
+STRUCTURED_OUTPUT_RETRIES = 1
+
+# analyze_code and check_code_quality share one Pylint engine. Results are cached
+# by file content and Pylint configuration; LINT_JOBS caps Pylint's --jobs, which
+# never exceeds the number of files linted (0 uses every CPU) and LINT_RCFILE an optional Pylint configuration file.
+LINT_JOBS = 0
+LINT_RCFILE = None
+LINT_CACHE_ENTRIES = 4096
+
+# In-memory search index over the workspace. Files changed outside the
+# Environment are noticed by an mtime/size scan at most every
+# WORKSPACE_INDEX_REFRESH_INTERVAL seconds; larger files are not indexed.
+# search_files returns at most WORKSPACE_SEARCH_LIMIT matching lines.
+WORKSPACE_INDEX_REFRESH_INTERVAL = 10
+WORKSPACE_INDEX_MAX_FILE_BYTES = 1024 * 1024
+WORKSPACE_SEARCH_LIMIT = 50
+
+# Workspace file I/O runs on WORKSPACE_IO_WORKERS threads. Writes to the same
+# file within WORKSPACE_WRITE_COALESCE_WINDOW seconds are merged into one, and up
+# to WORKSPACE_READ_CACHE_ENTRIES small files are cached for reads.
+WORKSPACE_IO_WORKERS = 4
+WORKSPACE_WRITE_COALESCE_WINDOW = 0.05
+WORKSPACE_READ_CACHE_ENTRIES = 256
+WORKSPACE_READ_CACHE_MAX_FILE_BYTES = 256 * 1024
+
+# Worker threads that run the remaining (lightweight) skills invoked through
+# command|... action items
+SKILL_WORKERS = 4
+
+# Skills that run in a child process, each with a timeout in seconds after
+# which the process is killed and a cap on concurrent runs across all agents.
+SKILL_LIMITS = {
+    'run_pylint': {'timeout': 300, 'max_concurrent': 2},
+    'run_unit_tests': {'timeout': 300, 'max_concurrent': 2},
+    'generate_documentation': {'timeout': 120, 'max_concurrent': 2},
+    'install_dependencies': {'timeout': 600, 'max_concurrent': 1},
+    'git_clone': {'timeout': 300, 'max_concurrent': 2},
+    'git_pull': {'timeout': 120, 'max_concurrent': 2},
+    'git_push': {'timeout': 120, 'max_concurrent': 2},
+}
+
+# Generate each agent's messages to all teammates in one structured call per
+# turn instead of one call per recipient.
+BATCH_MESSAGES = True
+
+# Every DIGEST_INTERVAL rounds (None disables) one LLM call condenses each agent's
+# latest action and the important info saved since the previous digest into a
+# team digest. It is stored once and shown to every agent in its next prompt. With
+# DIGEST_REPLACES_STATUS_MESSAGES the per-turn status messages to neighbours are
+# skipped, as the digest carries the same news. DIGEST_ITEM_CHARS caps each action
+# or info item in the digest prompt.
+DIGEST_INTERVAL = 3
+DIGEST_REPLACES_STATUS_MESSAGES = True
+DIGEST_ITEM_CHARS = 300
+
+# Ask for a thought and its summary, and an action and its evaluation, as one
+# JSON response each instead of two sequential calls per step.
+FUSED_CALLS = False
+
+# Stream completions for thoughts and actions, rendering each line as it arrives
+# and handing action items to the agent as soon as their line is complete.
+STREAM_RESPONSES = False
+
+# Optional LLM response cache: an in-memory LRU in front of a SQLite store that
+# persists across runs. Entries expire after LLM_CACHE_TTL seconds.
+LLM_CACHE_ENABLED = False
+LLM_CACHE_MEMORY_ENTRIES = 1024
+LLM_CACHE_DISK_ENTRIES = 100000
+LLM_CACHE_TTL = 7 * 24 * 3600
+
+# Shared HTTP connection pool used by every provider client in the process
+CLIENT_POOL_SIZE = 100
+CLIENT_KEEPALIVE_CONNECTIONS = 20
+CLIENT_TIMEOUT = 600
+
+# Team communication graph. Agents only message their neighbours, so the cost of a
+# round grows with the number of edges rather than with the square of the team
+# size. 'kinds' combines any of:
+#   'all_to_all'       every agent with every other agent
+#   'reporting_lines'  each agent with its manager ('reports_to' in AGENTS)
+#   'squads'           agents that share a squad ('squads' in AGENTS)
+#   'k_nearest'        each agent with its k most similar colleagues by role,
+#                      responsibilities and skills
+# 'edges' lists extra (name, name) links. Broadcasts reach the sender's neighbours
+# or the members of one of its squads.
+TOPOLOGY = {
+    'kinds': ['reporting_lines', 'squads'],
+    'k': 3,
+    'edges': [],
+}
+
 # Agent configuration
 AGENTS = [
     {
         'name': 'Alice',
         'role': 'Project Manager',
         'responsibilities': 'Oversees project planning, coordination, and execution. Ensures projects are delivered on time, within scope and budget.',
-        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'send_message', 'send_email', 'take_break'],
+        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'check_code_quality', 'send_message', 'send_email', 'take_break'],
+        'squads': ['leads'],
     },
     {
         'name': 'Bob',
         'role': 'Software Architect',
         'responsibilities': 'Designs the high-level structure and architecture of software systems. Makes key design decisions and establishes technical standards.',
-        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'send_message', 'send_email', 'take_break'],
+        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'check_code_quality', 'send_message', 'send_email', 'take_break'],
+        'reports_to': 'Alice',
+        'squads': ['leads', 'application'],
     },
     {
         'name': 'Carol',
         'role': 'Senior Frontend Developer',
         'responsibilities': 'Develops complex user interfaces and frontend features. Mentors junior developers and ensures code quality and best practices.',
-        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'send_message', 'send_email', 'take_break'],
+        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'check_code_quality', 'send_message', 'send_email', 'take_break'],
+        'reports_to': 'Bob',
+        'squads': ['application'],
     },
     {
         'name': 'David',
         'role': 'Senior Backend Developer',
         'responsibilities': 'Designs and implements server-side logic and APIs. Optimizes system performance and scalability.',
-        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'send_message', 'send_email', 'take_break'],
+        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'check_code_quality', 'send_message', 'send_email', 'take_break'],
+        'reports_to': 'Bob',
+        'squads': ['application', 'platform'],
     },
     {
         'name': 'Eve',
         'role': 'DevOps Engineer',
         'responsibilities': 'Automates development, testing, and deployment processes. Ensures system reliability and monitors production environments.',
-        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'send_message', 'send_email', 'take_break'],
+        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'check_code_quality', 'send_message', 'send_email', 'take_break'],
+        'reports_to': 'Alice',
+        'squads': ['platform'],
     },
     {
         'name': 'Frank',
         'role': 'Data Engineer',
         'responsibilities': 'Designs and builds data pipelines and storage systems. Ensures data quality, security, and accessibility for analysis and reporting.',
-        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'send_message', 'send_email', 'take_break'],
+        'skills': ['scrape_webpage', 'save_file', 'edit_file', 'analyze_code', 'search_files', 'run_unit_tests', 'generate_documentation', 'check_code_quality', 'send_message', 'send_email', 'take_break'],
+        'reports_to': 'Eve',
+        'squads': ['platform'],
     }
 ]
 
@@ -112,6 +298,13 @@ Remember to:
 - Actively collaborate with your team by incorporating their feedback, ideas, and expertise
 
 Avoid including irrelevant or extraneous information. Concentrate on providing concrete next steps and solutions that move the project forward.
+""",
+        "structured": """Your team members have provided the following updates and responses:
+
+{context}
+
+Respond with a single JSON object and nothing else: no prose and no code fences. The object must match this JSON schema:
+{schema}
 """
     },
     "analyze_context": """
@@ -1,169 +1,564 @@
 import sqlite3
 import os
-from config import DATABASE_DIR, WORKSPACE_DIR
+import atexit
+import datetime
+import logging
+import queue
+import threading
+import time
+from config import (
+    DATABASE_DIR, WORKSPACE_DIR, CHAT_FLUSH_INTERVAL, CHAT_FLUSH_BATCH_SIZE, CHAT_FLUSH_TIMEOUT,
+    CONSOLIDATE_DATABASES, CONSOLIDATED_DATABASE_FILE, SQLITE_SYNCHRONOUS,
+    SQLITE_CACHE_SIZE_KB, SQLITE_BUSY_TIMEOUT_MS
+)
+
+logger = logging.getLogger(__name__)
+
+DATABASE_FILES = {
+    'emails': 'agent_emails.db',
+    'chat': 'chat_history.db',
+    'knowledge': 'knowledge_base.db',
+    'info': 'important_info.db',
+    'llm_cache': 'llm_cache.db',
+}
+
+class ConnectionManager:
+    """
+    Long-lived SQLite connections, one per database file and thread.
+
+    Connections are opened on first use and kept for the life of the process, in WAL
+    mode so readers never block the chat writer thread. With consolidate=True every
+    logical database is stored in a single file.
+    """
+
+    def __init__(self, database_dir=DATABASE_DIR, consolidate=CONSOLIDATE_DATABASES):
+        self.database_dir = database_dir
+        self.consolidate = consolidate
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def path(self, name):
+        file_name = CONSOLIDATED_DATABASE_FILE if self.consolidate else DATABASE_FILES[name]
+        return os.path.join(self.database_dir, file_name)
+
+    def connect(self, name):
+        if not hasattr(self.local, 'connections'):
+            self.local.connections = {}
+        path = self.path(name)
+        conn = self.local.connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+            conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            self.local.connections[path] = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def close_all(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+        self.local = threading.local()
+
+connections = ConnectionManager()
+
+def get_connection(name):
+    return connections.connect(name)
 
 def create_databases_and_folders():
     os.makedirs(DATABASE_DIR, exist_ok=True)
     os.makedirs(WORKSPACE_DIR, exist_ok=True)
 
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'agent_emails.db'))
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS emails
-                 (sender TEXT, recipient TEXT, subject TEXT, body TEXT, timestamp TEXT, reply_to TEXT, forward_to TEXT, attachment TEXT)''')
-    conn.commit()
-    conn.close()
+    conn = get_connection('emails')
+    with conn:
+        migrate_emails(conn)
 
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'chat_history.db'))
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS messages
-                 (sender TEXT, recipients TEXT, message TEXT, timestamp TEXT)''')
-    conn.commit()
-    conn.close()
+    conn = get_connection('chat')
+    with conn:
+        migrate_chat_history(conn)
 
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'knowledge_base.db'))
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS knowledge
-                 (key TEXT PRIMARY KEY, value TEXT)''')
-    conn.commit()
-    conn.close()
+    conn = get_connection('knowledge')
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS knowledge
+                     (key TEXT PRIMARY KEY, value TEXT)''')
 
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'important_info.db'))
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS info
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT)''')
-    conn.commit()
-    conn.close()
-
-def load_emails(agent_emails):
-    create_databases_and_folders()
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'agent_emails.db'))
+    conn = get_connection('info')
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS info
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS digests
+                     (id INTEGER PRIMARY KEY, round INTEGER NOT NULL, last_info_id INTEGER NOT NULL, content TEXT, ts INTEGER NOT NULL)''')
+        migrate_important_info(conn)
+
+    if connections.consolidate:
+        consolidate_databases()
+
+def consolidate_databases():
+    """
+    Copy rows from the legacy per-domain database files into the consolidated file.
+
+    Runs once per consolidated file; the legacy files are left untouched.
+
+    Returns:
+        int: The number of legacy files that were imported.
+    """
+    conn = get_connection('chat')
+    if get_schema_version(conn, 'consolidation') >= 1:
+        return 0
+
+    tables = {'emails': ['emails', 'mail_cursors'], 'chat': ['messages', 'message_recipients'], 'knowledge': ['knowledge'], 'info': ['info', 'digests']}
+    imported = 0
+    for name, table_names in tables.items():
+        legacy_path = os.path.join(connections.database_dir, DATABASE_FILES[name])
+        if not os.path.exists(legacy_path):
+            continue
+        if name in ('chat', 'emails'):
+            # Bring the legacy file up to the current schema before copying it.
+            migrate = migrate_chat_history if name == 'chat' else migrate_emails
+            legacy_conn = sqlite3.connect(legacy_path)
+            with legacy_conn:
+                migrate(legacy_conn)
+            legacy_conn.close()
+        conn.execute("ATTACH DATABASE ? AS legacy", (legacy_path,))
+        try:
+            with conn:
+                for table in table_names:
+                    if conn.execute("SELECT 1 FROM legacy.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                        conn.execute(f"INSERT OR IGNORE INTO main.{table} SELECT * FROM legacy.{table}")
+                imported += 1
+        finally:
+            conn.execute("DETACH DATABASE legacy")
+    with conn:
+        set_schema_version(conn, 'consolidation', 1)
+    return imported
+
+def get_schema_version(conn, component):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_versions (component TEXT PRIMARY KEY, version INTEGER)")
+    row = conn.execute("SELECT version FROM schema_versions WHERE component = ?", (component,)).fetchone()
+    return row[0] if row else 0
+
+def set_schema_version(conn, component, version):
+    conn.execute("INSERT OR REPLACE INTO schema_versions (component, version) VALUES (?, ?)", (component, version))
+
+def create_chat_tables(conn):
+    # Recipients live in their own table and timestamps are integer epoch
+    # milliseconds, so per-agent history is an index range scan in both directions.
+    conn.execute('''CREATE TABLE IF NOT EXISTS messages
+                 (id INTEGER PRIMARY KEY, sender TEXT NOT NULL, message TEXT, ts INTEGER NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS message_recipients
+                 (message_id INTEGER NOT NULL REFERENCES messages(id), recipient TEXT NOT NULL, ts INTEGER NOT NULL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender_ts ON messages (sender, ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_message_recipients_recipient_ts ON message_recipients (recipient, ts, message_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_message_recipients_message_id ON message_recipients (message_id)")
+
+def migrate_chat_history(conn):
+    version = get_schema_version(conn, 'chat_history')
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(messages)")]
+    legacy = 'recipients' in columns
+
+    if version < 1 and legacy:
+        # Older versions re-inserted the whole in-memory history on every message.
+        deduplicate_chat_history(conn)
+    if version < 2:
+        if legacy:
+            conn.execute("ALTER TABLE messages RENAME TO messages_legacy")
+        create_chat_tables(conn)
+        if legacy:
+            normalize_legacy_chat_history(conn)
+            conn.execute("DROP TABLE messages_legacy")
+        set_schema_version(conn, 'chat_history', 2)
+    create_chat_tables(conn)
+    if version < 3:
+        create_search_index(conn, 'messages', 'message')
+        set_schema_version(conn, 'chat_history', 3)
+
+def create_email_tables(conn):
+    # Every email is one row per recipient. An inbox is an index range scan on
+    # (recipient, timestamp, id), and mail_cursors holds the (timestamp, id) of the
+    # last email each recipient has read.
+    conn.execute('''CREATE TABLE IF NOT EXISTS emails
+                 (id INTEGER PRIMARY KEY, sender TEXT, recipient TEXT NOT NULL, subject TEXT, body TEXT, timestamp TEXT NOT NULL,
+                  reply_to TEXT, forward_to TEXT, attachment TEXT)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_emails_recipient_timestamp ON emails (recipient, timestamp, id)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS mail_cursors
+                 (recipient TEXT PRIMARY KEY, timestamp TEXT NOT NULL, email_id INTEGER NOT NULL)''')
+
+def migrate_emails(conn):
+    if get_schema_version(conn, 'emails') < 1:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(emails)")]
+        legacy = columns and 'id' not in columns
+        if legacy:
+            conn.execute("ALTER TABLE emails RENAME TO emails_legacy")
+        create_email_tables(conn)
+        if legacy:
+            conn.execute('''INSERT INTO emails (sender, recipient, subject, body, timestamp, reply_to, forward_to, attachment)
+                            SELECT sender, recipient, subject, body, COALESCE(timestamp, ''), reply_to, forward_to, attachment
+                            FROM emails_legacy ORDER BY timestamp, rowid''')
+            conn.execute("DROP TABLE emails_legacy")
+        set_schema_version(conn, 'emails', 1)
+    create_email_tables(conn)
+
+def migrate_important_info(conn):
+    if get_schema_version(conn, 'important_info') < 1:
+        create_search_index(conn, 'info', 'content')
+        set_schema_version(conn, 'important_info', 1)
+
+def create_search_index(conn, table, column):
+    """
+    Create an FTS5 index over one text column, kept in sync with its table by triggers.
+
+    Existing rows are indexed once. If the SQLite build lacks FTS5 nothing is created
+    and searches fall back to a LIKE scan.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database holding the table.
+        table (str): The content table, which must have an integer id primary key.
+        column (str): The text column to index.
+    """
+    fts = f"{table}_fts"
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column}, content='{table}', content_rowid='id')")
+    except sqlite3.OperationalError:
+        logger.warning(f"FTS5 is not available; searching {table} will use a LIKE scan")
+        return
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                     INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column});
+                 END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                     INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                 END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE ON {table} BEGIN
+                     INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                     INSERT INTO {fts} (rowid, {column}) VALUES (new.id, new.{column});
+                 END""")
+    conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def has_search_index(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f"{table}_fts",)).fetchone() is not None
+
+def fts_query(keyword):
+    # Quote every term so punctuation in LLM output is not parsed as FTS5 syntax.
+    return " ".join('"' + term.replace('"', '""') + '"' for term in keyword.split())
+
+def normalize_legacy_chat_history(conn):
+    rows = conn.execute("SELECT sender, recipients, message, timestamp FROM messages_legacy ORDER BY timestamp, rowid").fetchall()
+    messages = []
+    for sender, recipients, message, timestamp in rows:
+        try:
+            ts = int(datetime.datetime.fromisoformat(timestamp).timestamp() * 1000)
+        except (TypeError, ValueError):
+            ts = 0
+        messages.append({"sender": sender, "recipients": recipients.split(', ') if recipients else [], "message": message, "ts": ts})
+    insert_chat_messages(conn, messages)
+
+def deduplicate_chat_history(conn):
     c = conn.cursor()
-    c.execute('SELECT * FROM emails ORDER BY timestamp')
-    rows = c.fetchall()
-    conn.close()
-
-    for row in rows:
-        sender, recipient, subject, body, timestamp, reply_to, forward_to, attachment = row
-        email_data = {
-            "sender": sender,
-            "recipient": recipient,
-            "subject": subject,
-            "body": body,
-            "timestamp": timestamp,
-            "reply_to": reply_to,
-            "forward_to": forward_to,
-            "attachment": attachment
-        }
-        agent_emails.setdefault(recipient, []).append(email_data)
+    c.execute("DELETE FROM messages WHERE rowid NOT IN (SELECT MIN(rowid) FROM messages GROUP BY sender, recipients, message, timestamp)")
+    return c.rowcount
 
 def save_chat_history(chat_history):
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'chat_history.db'))
+    conn = get_connection('chat')
+    with conn:
+        insert_chat_messages(conn, chat_history)
+
+def insert_chat_messages(conn, chat_history):
     c = conn.cursor()
-    c.executemany("INSERT INTO messages VALUES (?, ?, ?, ?)", [(msg['sender'], ', '.join(msg['recipients']), msg['message'], msg['timestamp']) for msg in chat_history])
-    conn.commit()
-    conn.close()
+    recipient_rows = []
+    for msg in chat_history:
+        c.execute("INSERT INTO messages (sender, message, ts) VALUES (?, ?, ?)", (msg['sender'], msg['message'], msg['ts']))
+        recipient_rows.extend((c.lastrowid, recipient, msg['ts']) for recipient in msg['recipients'])
+    c.executemany("INSERT INTO message_recipients (message_id, recipient, ts) VALUES (?, ?, ?)", recipient_rows)
+
+def chat_messages_from_rows(conn, rows):
+    recipients = {}
+    if rows:
+        placeholders = ','.join(['?'] * len(rows))
+        for message_id, recipient in conn.execute(f"SELECT message_id, recipient FROM message_recipients WHERE message_id IN ({placeholders}) ORDER BY rowid", [row[0] for row in rows]):
+            recipients.setdefault(message_id, []).append(recipient)
+
+    return [{
+        "id": message_id,
+        "sender": sender,
+        "recipients": recipients.get(message_id, []),
+        "message": message,
+        "ts": ts,
+        "timestamp": datetime.datetime.fromtimestamp(ts / 1000).isoformat()
+    } for message_id, sender, message, ts in rows]
+
+class ChatHistoryWriter:
+    """
+    Write-behind persistence for chat messages.
+
+    Messages are queued by the caller and written by a background thread, one
+    transaction per batch. A batch is flushed once it reaches batch_size messages or
+    flush_interval seconds after its first message, whichever comes first. Pending
+    messages are flushed on close() and at interpreter exit.
+    """
+
+    _STOP = object()
+
+    def __init__(self, flush_interval=CHAT_FLUSH_INTERVAL, batch_size=CHAT_FLUSH_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, message):
+        self.queue.put(message)
+
+    def flush(self, timeout=CHAT_FLUSH_TIMEOUT):
+        """
+        Wait until the messages queued so far are written.
+
+        Returns:
+            bool: False if the writer is closed or did not finish within timeout seconds.
+        """
+        if self.closed or not self.thread.is_alive():
+            return False
+        flushed = threading.Event()
+        self.queue.put(flushed)
+        return flushed.wait(timeout)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.put(self._STOP)
+            self.thread.join()
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = max(0, deadline - time.monotonic()) if pending else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is self._STOP:
+                self._write(pending)
+                return
+            if isinstance(item, threading.Event):
+                self._write(pending)
+                pending = []
+                item.set()
+                continue
+            if item is not None:
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(item)
+
+            if len(pending) >= self.batch_size or (pending and time.monotonic() >= deadline):
+                self._write(pending)
+                pending = []
+
+    def _write(self, messages):
+        if not messages:
+            return
+        try:
+            save_chat_history(messages)
+        except sqlite3.Error:
+            logger.exception(f"Error occurred while saving {len(messages)} chat message(s)")
 
 def recall_steps():
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'chat_history.db'))
-    c = conn.cursor()
-    c.execute('SELECT * FROM messages ORDER BY timestamp')
-    rows = c.fetchall()
-    conn.close()
+    conn = get_connection('chat')
+    rows = conn.execute('SELECT id, sender, message, ts FROM messages ORDER BY ts, id').fetchall()
+
+    for msg in chat_messages_from_rows(conn, rows):
+        print(f"{msg['timestamp']} - {msg['sender']} to {', '.join(msg['recipients'])}: {msg['message']}")
 
-    for row in rows:
-        sender, recipients, message, timestamp = row
-        print(f"{timestamp} - {sender} to {recipients}: {message}")
+def email_address(agent_name):
+    return f"{agent_name.lower()}@company.com"
 
 def save_email(sender_email, recipient_names, subject, body, timestamp, reply_to=None, forward_to=None, attachment=None):
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'agent_emails.db'))
-    c = conn.cursor()
-    recipient_emails = [f"{name.lower()}@company.com" for name in recipient_names]
-    email_data = [(sender_email, recipient_email, subject, body, timestamp, reply_to, forward_to, attachment) for recipient_email in recipient_emails]
-    c.executemany("INSERT INTO emails VALUES (?, ?, ?, ?, ?, ?, ?, ?)", email_data)
-    conn.commit()
-    conn.close()
-
-def check_email_inbox(agent_name, agent_emails):
-    agent_email = f"{agent_name.lower()}@company.com"
-    if agent_email in agent_emails:
-        print(f"Checking inbox for {agent_name}...")
-        for email in agent_emails[agent_email]:
-            print(f"From: {email['sender']}\nSubject: {email['subject']}\nBody: {email['body']}\n")
-    else:
-        print(f"No emails found for {agent_name}.")
+    conn = get_connection('emails')
+    email_data = [(sender_email, email_address(name), subject, body, timestamp, reply_to, forward_to, attachment) for name in recipient_names]
+    with conn:
+        conn.executemany('''INSERT INTO emails (sender, recipient, subject, body, timestamp, reply_to, forward_to, attachment)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', email_data)
+
+def fetch_unread(agent_name, limit=None):
+    """
+    Fetch an agent's oldest unread emails and mark them as read.
+
+    Each call returns the next page after the agent's read cursor and moves the
+    cursor past it, so repeated calls walk the inbox without rereading it.
+
+    Args:
+        agent_name (str): The recipient agent.
+        limit (int, optional): Maximum number of emails to return.
+
+    Returns:
+        list: Email dicts, oldest first.
+    """
+    conn = get_connection('emails')
+    recipient = email_address(agent_name)
+    cursor = conn.execute("SELECT timestamp, email_id FROM mail_cursors WHERE recipient = ?", (recipient,)).fetchone() or ('', 0)
+    rows = conn.execute('''SELECT id, sender, recipient, subject, body, timestamp, reply_to, forward_to, attachment FROM emails
+                           WHERE recipient = ? AND (timestamp, id) > (?, ?) ORDER BY timestamp, id LIMIT ?''',
+                        (recipient, *cursor, limit or -1)).fetchall()
+    if rows:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO mail_cursors (recipient, timestamp, email_id) VALUES (?, ?, ?)", (recipient, rows[-1][5], rows[-1][0]))
+
+    columns = ["id", "sender", "recipient", "subject", "body", "timestamp", "reply_to", "forward_to", "attachment"]
+    return [dict(zip(columns, row)) for row in rows]
+
+def count_unread(agent_name):
+    conn = get_connection('emails')
+    recipient = email_address(agent_name)
+    cursor = conn.execute("SELECT timestamp, email_id FROM mail_cursors WHERE recipient = ?", (recipient,)).fetchone() or ('', 0)
+    return conn.execute("SELECT COUNT(*) FROM emails WHERE recipient = ? AND (timestamp, id) > (?, ?)", (recipient, *cursor)).fetchone()[0]
 
 def save_knowledge(key, value):
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'knowledge_base.db'))
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO knowledge (key, value) VALUES (?, ?)", (key, value))
-    conn.commit()
-    conn.close()
+    conn = get_connection('knowledge')
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO knowledge (key, value) VALUES (?, ?)", (key, value))
 
 def get_knowledge(key):
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'knowledge_base.db'))
-    c = conn.cursor()
-    c.execute("SELECT value FROM knowledge WHERE key = ?", (key,))
-    result = c.fetchone()
-    conn.close()
+    conn = get_connection('knowledge')
+    result = conn.execute("SELECT value FROM knowledge WHERE key = ?", (key,)).fetchone()
     return result[0] if result else None
 
-def get_chat_history(participants=None, limit=None):
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'chat_history.db'))
-    c = conn.cursor()
-    
+def get_chat_history(participants=None, limit=None, after=None, before=None):
+    """
+    Fetch chat messages sent or received by the given participants using keyset pagination.
+
+    Args:
+        participants (list, optional): Agent names to filter on, as sender or recipient.
+        limit (int, optional): Maximum number of messages to return.
+        after (int, optional): Only return messages newer than the message with this id,
+            oldest first, so a page can be followed forwards.
+        before (int, optional): Only return messages older than the message with this id.
+
+    Returns:
+        list: Message dicts, newest first unless after is given.
+    """
+    conn = get_connection('chat')
+    limit = limit or -1
+    conditions = []
+    params = []
+    for cursor, operator in ((after, '>'), (before, '<')):
+        if cursor is not None:
+            row = conn.execute("SELECT ts, id FROM messages WHERE id = ?", (cursor,)).fetchone()
+            if row is None:
+                return []
+            conditions.append(f"(ts, {{id}}) {operator} (?, ?)")
+            params.extend(row)
+    order = "ASC" if after is not None and before is None else "DESC"
+
     if participants:
-        query = "SELECT * FROM messages WHERE sender IN ({}) OR recipients LIKE '%{}%' ORDER BY timestamp DESC".format(','.join(['?'] * len(participants)), ','.join(participants))
-        c.execute(query, participants)
+        # One index range scan per participant and direction, each capped at the page size.
+        branches = []
+        branch_params = []
+        for participant in participants:
+            for table, id_column, name_column in (("messages", "id", "sender"), ("message_recipients", "message_id", "recipient")):
+                where = " AND ".join([f"{name_column} = ?"] + [condition.format(id=id_column) for condition in conditions])
+                branches.append(f"SELECT * FROM (SELECT {id_column} AS id FROM {table} WHERE {where} ORDER BY ts {order}, {id_column} {order} LIMIT ?)")
+                branch_params.extend([participant] + params + [limit])
+        query = f"SELECT id, sender, message, ts FROM messages WHERE id IN ({' UNION '.join(branches)}) ORDER BY ts {order}, id {order} LIMIT ?"
+        rows = conn.execute(query, branch_params + [limit]).fetchall()
     else:
-        c.execute("SELECT * FROM messages ORDER BY timestamp DESC")
-    
-    rows = c.fetchmany(limit) if limit else c.fetchall()
-    conn.close()
-    
-    chat_history = []
-    for row in rows:
-        sender, recipients, message, timestamp = row
-        chat_history.append({
-            "sender": sender,
-            "recipients": recipients.split(', '),
-            "message": message,
-            "timestamp": timestamp
-        })
-    
-    return chat_history
-
-def search_chat_history(keyword):
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'chat_history.db'))
-    c = conn.cursor()
-    c.execute("SELECT * FROM messages WHERE message LIKE ? ORDER BY timestamp DESC", (f'%{keyword}%',))
-    rows = c.fetchall()
-    conn.close()
-    
-    search_results = []
-    for row in rows:
-        sender, recipients, message, timestamp = row
-        search_results.append({
-            "sender": sender,
-            "recipients": recipients.split(', '),
-            "message": message,
-            "timestamp": timestamp
-        })
-    
+        where = " AND ".join(condition.format(id="id") for condition in conditions) or "1"
+        rows = conn.execute(f"SELECT id, sender, message, ts FROM messages WHERE {where} ORDER BY ts {order}, id {order} LIMIT ?", params + [limit]).fetchall()
+
+    return chat_messages_from_rows(conn, rows)
+
+def search_chat_history(keyword, limit=None):
+    """
+    Full-text search over chat messages, best matches first.
+
+    Args:
+        keyword (str): One or more terms; every term must match.
+        limit (int, optional): Maximum number of results to return.
+
+    Returns:
+        list: Message dicts with an added "snippet" highlighting the match and its bm25 "rank".
+    """
+    conn = get_connection('chat')
+    if not keyword.strip():
+        return []
+    if not has_search_index(conn, 'messages'):
+        rows = conn.execute("SELECT id, sender, message, ts FROM messages WHERE message LIKE ? ORDER BY ts DESC, id DESC LIMIT ?", (f'%{keyword}%', limit or -1)).fetchall()
+        return chat_messages_from_rows(conn, rows)
+
+    rows = conn.execute("""SELECT m.id, m.sender, m.message, m.ts, snippet(messages_fts, 0, '[', ']', '...', 16), bm25(messages_fts)
+                           FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+                           WHERE messages_fts MATCH ? ORDER BY bm25(messages_fts) LIMIT ?""", (fts_query(keyword), limit or -1)).fetchall()
+    search_results = chat_messages_from_rows(conn, [row[:4] for row in rows])
+    for result, row in zip(search_results, rows):
+        result["snippet"] = row[4]
+        result["rank"] = row[5]
     return search_results
 
 def save_important_info(info):
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'important_info.db'))
-    c = conn.cursor()
-    c.execute("INSERT INTO info (content) VALUES (?)", (info,))
-    conn.commit()
-    conn.close()
+    conn = get_connection('info')
+    with conn:
+        conn.execute("INSERT INTO info (content) VALUES (?)", (info,))
+
+def get_important_info(after=None, limit=None):
+    conn = get_connection('info')
+    if after is None and limit is None:
+        rows = conn.execute("SELECT * FROM info").fetchall()
+    else:
+        # The oldest rows after the given id, so a caller paging by id skips none.
+        rows = conn.execute("SELECT * FROM info WHERE id > ? ORDER BY id LIMIT ?", (after or 0, limit or -1)).fetchall()
 
-def get_important_info():
-    conn = sqlite3.connect(os.path.join(DATABASE_DIR, 'important_info.db'))
-    c = conn.cursor()
-    c.execute("SELECT * FROM info")
-    rows = c.fetchall()
-    conn.close()
-    
     important_info = [{"id": row[0], "content": row[1]} for row in rows]
     return important_info
+
+def search_important_info(keyword, limit=None):
+    """
+    Full-text search over saved important information, best matches first.
+
+    Args:
+        keyword (str): One or more terms; every term must match.
+        limit (int, optional): Maximum number of results to return.
+
+    Returns:
+        list: Dicts with "id", "content", a "snippet" highlighting the match and its bm25 "rank".
+    """
+    conn = get_connection('info')
+    if not keyword.strip():
+        return []
+    if not has_search_index(conn, 'info'):
+        rows = conn.execute("SELECT id, content, content, 0 FROM info WHERE content LIKE ? ORDER BY id DESC LIMIT ?", (f'%{keyword}%', limit or -1)).fetchall()
+    else:
+        rows = conn.execute("""SELECT i.id, i.content, snippet(info_fts, 0, '[', ']', '...', 16), bm25(info_fts)
+                               FROM info_fts JOIN info i ON i.id = info_fts.rowid
+                               WHERE info_fts MATCH ? ORDER BY bm25(info_fts) LIMIT ?""", (fts_query(keyword), limit or -1)).fetchall()
+    return [{"id": row[0], "content": row[1], "snippet": row[2], "rank": row[3]} for row in rows]
+
+def save_digest(round_number, last_info_id, content):
+    """
+    Store a team digest.
+
+    Args:
+        round_number (int): The scheduler round the digest was written after.
+        last_info_id (int): Id of the newest important info row it covers.
+        content (str): The digest text.
+
+    Returns:
+        dict: The stored digest with its id.
+    """
+    conn = get_connection('info')
+    ts = int(time.time() * 1000)
+    with conn:
+        digest_id = conn.execute("INSERT INTO digests (round, last_info_id, content, ts) VALUES (?, ?, ?, ?)",
+                                 (round_number, last_info_id, content, ts)).lastrowid
+    return {"id": digest_id, "round": round_number, "last_info_id": last_info_id, "content": content, "ts": ts}
+
+def get_latest_digest():
+    conn = get_connection('info')
+    row = conn.execute("SELECT id, round, last_info_id, content, ts FROM digests ORDER BY id DESC LIMIT 1").fetchone()
+    return dict(zip(["id", "round", "last_info_id", "content", "ts"], row)) if row else None
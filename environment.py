@@ -1,11 +1,15 @@
+import asyncio
 import os
 import datetime
-from config import DATABASE_DIR, WORKSPACE_DIR
+from config import DATABASE_DIR, WORKSPACE_DIR, WORKSPACE_SEARCH_LIMIT, EMAIL_FETCH_LIMIT
 import database
+from actions import ActionDispatcher
+from inbox import Envelope, MESSAGE
+from skill_runner import SkillRunner
 from colorama import init, Fore, Style
-import requests
-from bs4 import BeautifulSoup
-from skills import scrape_webpage
+from skills import scrape_webpage, format_search_results
+from workspace_index import WorkspaceIndex
+from workspace_io import WorkspaceFiles
 
 init()
 
@@ -23,189 +27,304 @@ AGENT_STYLES = {
 class Environment:
     def __init__(self):
         self.agents = []
-        self.agent_emails = {}
-        self.chat_history = []
+        self.agents_by_name = {}
+        self.topology = None
+        self.actor_tasks = {}
+        self.email_addresses = {}
         self.database = database
         self.workspaces = {}
-
-    def load_emails(self):
-        database.load_emails(self.agent_emails)
+        self.workspace_index = WorkspaceIndex(WORKSPACE_DIR)
+        self.index_refresh = None
+        self.workspace_files = WorkspaceFiles(on_write=self.index_workspace_file)
+        database.create_databases_and_folders()
+        self.chat_writer = database.ChatHistoryWriter()
+        self.latest_digest = database.get_latest_digest()
+        self.skill_runner = SkillRunner()
+        self.dispatcher = ActionDispatcher(self)
 
     def add_agent(self, agent):
         self.agents.append(agent)
+        self.agents_by_name[agent.name] = agent
+        self.email_addresses[database.email_address(agent.name)] = agent.name
         self.workspaces[agent.name] = os.path.join(WORKSPACE_DIR, agent.name)
         os.makedirs(self.workspaces[agent.name], exist_ok=True)
 
-    async def send_message(self, sender, recipient, message):
-        for agent in self.agents:
-            if agent.name == recipient:
-                self.print_formatted(recipient, f"{recipient} received a message from {sender}: '{message}'", border_style="▃▃▃")
-                agent.actions.append(f"Received message from {sender}: '{message}'")
+    async def send_message(self, sender, recipient, message, priority=MESSAGE):
+        agent = self.agents_by_name.get(recipient)
+        if agent is not None:
+            self.start_actor(agent)
+            agent.inbox.offer(sender, message, priority)
 
-        timestamp = datetime.datetime.now().isoformat()
-        self.chat_history.append({
+        now = datetime.datetime.now()
+        chat_message = {
             "sender": sender,
             "recipients": [recipient],
             "message": message,
-            "timestamp": timestamp
-        })
-        database.save_chat_history(chat_history=self.chat_history)
+            "ts": int(now.timestamp() * 1000),
+            "timestamp": now.isoformat()
+        }
+        self.chat_writer.enqueue(chat_message)
 
-    async def broadcast_message(self, sender, recipients, message):
+    async def broadcast_message(self, sender, message, squad=None, priority=MESSAGE):
+        """Send a message to the sender's neighbours, or to the other members of one of its squads."""
+        if self.topology is None:
+            recipients = [agent.name for agent in self.agents if agent.name != sender]
+        else:
+            recipients = self.topology.scope(sender, squad)
         for recipient in recipients:
-            await self.send_message(sender, recipient, message)
+            await self.send_message(sender, recipient, message, priority)
+
+    def set_topology(self, topology):
+        self.topology = topology
+
+    def neighbours(self, agent_name):
+        """
+        Return the Agents an agent exchanges messages with.
+
+        These are its neighbours in the topology, or every other agent if no topology was set.
+        """
+        if self.topology is None:
+            return [agent for agent in self.agents if agent.name != agent_name]
+        return [self.agents_by_name[name] for name in self.topology.neighbours(agent_name) if name in self.agents_by_name]
+
+    def start_actor(self, agent):
+        task = self.actor_tasks.get(agent.name)
+        if task is None or task.done():
+            self.actor_tasks[agent.name] = asyncio.create_task(agent.run(), name=f"actor-{agent.name}")
+
+    async def run_turn(self, agent_name, work):
+        """
+        Have an agent's actor run one piece of work and wait for it.
 
-    def check_email(self, agent_name):
-        email_contents = database.check_email_inbox(agent_name, self.agent_emails)
-        return email_contents
+        Args:
+            agent_name (str): The agent to run the work.
+            work (callable): A coroutine function called with the Agent.
+
+        Returns:
+            The result of work.
+        """
+        agent = self.agents_by_name[agent_name]
+        self.start_actor(agent)
+        envelope = Envelope('turn', work=work, future=asyncio.get_running_loop().create_future())
+        await agent.inbox.put(envelope)
+        return await envelope.future
+
+    async def stop_actors(self):
+        for name, task in self.actor_tasks.items():
+            if not task.done():
+                await self.agents_by_name[name].inbox.put(Envelope('stop'))
+        await asyncio.gather(*self.actor_tasks.values(), return_exceptions=True)
+        self.actor_tasks.clear()
+
+    def check_email(self, agent_name, limit=EMAIL_FETCH_LIMIT):
+        return database.fetch_unread(agent_name, limit)
+
+    def count_unread_emails(self, agent_name):
+        return database.count_unread(agent_name)
 
     def send_email(self, sender_name, recipient_names, subject, body, reply_to=None, forward_to=None, attachment=None):
-        sender_email = f"{sender_name.lower()}@company.com"
-        if sender_email not in self.agent_emails:
+        sender_email = database.email_address(sender_name)
+        if sender_email not in self.email_addresses:
             raise ValueError(f"Invalid sender email: {sender_email}")
-
-        for recipient_name in recipient_names:
-            recipient_email = f"{recipient_name.lower()}@company.com"
-            if recipient_email not in self.agent_emails:
+        recipient_emails = [database.email_address(recipient_name) for recipient_name in recipient_names]
+        for recipient_email in recipient_emails:
+            if recipient_email not in self.email_addresses:
                 raise ValueError(f"Invalid recipient email: {recipient_email}")
 
-            email = {
-                "sender": sender_email,
-                "agent_name": sender_name,
-                "recipient": recipient_email,
-                "subject": subject,
-                "body": body,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "reply_to": reply_to,
-                "forward_to": forward_to,
-                "attachment": attachment
-            }
-            self.agent_emails[recipient_email].append(email)
+        timestamp = datetime.datetime.now().isoformat()
+        database.save_email(sender_email, recipient_names, subject, body, timestamp, reply_to, forward_to, attachment)
+        for recipient_email in recipient_emails:
             self.print_formatted(sender_name, f"Email sent from {sender_email} to {recipient_email}: {subject}")
 
-        database.save_email(sender_email, recipient_names, subject, body, email['timestamp'], reply_to, forward_to, attachment)
+    async def get_chat_history(self, participants=None, limit=None, after=None, before=None):
+        return await asyncio.to_thread(self.read_chat_history, database.get_chat_history, participants, limit, after, before)
 
-    def get_chat_history(self, participants=None, limit=None):
-        return database.get_chat_history(participants, limit)
+    async def search_chat_history(self, keyword, limit=None):
+        return await asyncio.to_thread(self.read_chat_history, database.search_chat_history, keyword, limit)
 
-    def search_chat_history(self, keyword):
-        return database.search_chat_history(keyword)
+    def read_chat_history(self, query, *args):
+        # Runs on a worker thread: waiting for the chat writer must not block the event loop.
+        self.chat_writer.flush()
+        return query(*args)
+
+    def close(self):
+        for task in self.actor_tasks.values():
+            task.cancel()
+        self.skill_runner.close()
+        self.dispatcher.shutdown()
+        self.workspace_files.close()
+        self.chat_writer.close()
+        database.connections.close_all()
 
     def save_important_info(self, info):
         database.save_important_info(info)
 
-    def get_important_info(self):
-        return database.get_important_info()
+    def get_important_info(self, after=None, limit=None):
+        return database.get_important_info(after, limit)
+
+    def save_digest(self, round_number, last_info_id, content):
+        self.latest_digest = database.save_digest(round_number, last_info_id, content)
+        self.print_formatted('System', f"Team digest #{self.latest_digest['id']} after round {round_number}:\n{content}")
+        return self.latest_digest
+
+    def search_important_info(self, keyword, limit=None):
+        return database.search_important_info(keyword, limit)
 
     def print_formatted(self, agent_name, message, border_style="▃▃▃", border_length=50):
-        agent_style = AGENT_STYLES[agent_name]
+        agent_style = AGENT_STYLES.get(agent_name, AGENT_STYLES['System'])
         border = border_style * border_length
         print(f"\n{agent_style}{border}{Style.RESET_ALL}")
         print(f"{agent_style}{message}{Style.RESET_ALL}")
         print(f"{agent_style}{border}{Style.RESET_ALL}\n")
 
-    def create_file(self, agent_name, file_name, content):
+    def print_stream_line(self, agent_name, line):
+        agent_style = AGENT_STYLES.get(agent_name, AGENT_STYLES['System'])
+        print(f"{agent_style}{agent_name}> {line}{Style.RESET_ALL}", flush=True)
+
+    async def create_file(self, agent_name, file_name, content):
         workspace_path = self.workspaces[agent_name]
         file_path = os.path.join(workspace_path, file_name)
-        with open(file_path, 'w') as file:
-            file.write(content)
+        await self.workspace_files.write(file_path, content)
         self.print_formatted('System', f"{agent_name} created file: {file_name}")
 
-    def read_file(self, agent_name, file_name):
+    async def read_file(self, agent_name, file_name):
         workspace_path = self.workspaces[agent_name]
         file_path = os.path.join(workspace_path, file_name)
         try:
-            with open(file_path, 'r') as file:
-                content = file.read()
+            content = await self.workspace_files.read(file_path)
             self.print_formatted('System', f"{agent_name} read file: {file_name}")
             return content
         except FileNotFoundError:
             self.print_formatted('System', f"File not found in {agent_name}'s workspace: {file_name}")
             return None
 
-    def update_file(self, agent_name, file_name, content):
+    async def update_file(self, agent_name, file_name, content):
         workspace_path = self.workspaces[agent_name]
         file_path = os.path.join(workspace_path, file_name)
         try:
-            with open(file_path, 'w') as file:
-                file.write(content)
+            await self.workspace_files.write(file_path, content)
             self.print_formatted('System', f"{agent_name} updated file: {file_name}")
         except FileNotFoundError:
             self.print_formatted('System', f"File not found in {agent_name}'s workspace: {file_name}")
 
-    def delete_file(self, agent_name, file_name):
+    async def delete_file(self, agent_name, file_name):
         workspace_path = self.workspaces[agent_name]
         file_path = os.path.join(workspace_path, file_name)
         try:
-            os.remove(file_path)
+            await self.workspace_files.delete(file_path)
+            await self.workspace_files.run(self.workspace_index.remove, file_path)
             self.print_formatted('System', f"{agent_name} deleted file: {file_name}")
         except FileNotFoundError:
             self.print_formatted('System', f"File not found in {agent_name}'s workspace: {file_name}")
 
-    def create_folder(self, agent_name, folder_name):
+    async def create_folder(self, agent_name, folder_name):
         workspace_path = self.workspaces[agent_name]
         folder_path = os.path.join(workspace_path, folder_name)
-        os.makedirs(folder_path, exist_ok=True)
+        await self.workspace_files.makedirs(folder_path)
         self.print_formatted('System', f"{agent_name} created folder: {folder_name}")
 
-    def list_folder_contents(self, agent_name, folder_name):
+    async def list_folder_contents(self, agent_name, folder_name):
         workspace_path = self.workspaces[agent_name]
         folder_path = os.path.join(workspace_path, folder_name)
         try:
-            contents = os.listdir(folder_path)
+            contents = await self.workspace_files.listdir(folder_path)
             self.print_formatted('System', f"Contents of {agent_name}'s folder '{folder_name}': {', '.join(contents)}")
             return contents
         except FileNotFoundError:
             self.print_formatted('System', f"Folder not found in {agent_name}'s workspace: {folder_name}")
             return None
 
+    async def index_workspace_file(self, file_path, content):
+        # Indexing, rescans and searches all run on the workspace I/O threads, never on the event loop.
+        await self.workspace_files.run(self.workspace_index.update, file_path, content)
+
+    def refresh_workspace_index(self):
+        # One rescan at a time, shared by everyone who asks while it runs.
+        if self.index_refresh is None or self.index_refresh.done():
+            self.index_refresh = asyncio.ensure_future(self.workspace_files.run(self.workspace_index.refresh))
+        return self.index_refresh
+
+    async def search_files(self, agent_name, keyword, directory=None, limit=WORKSPACE_SEARCH_LIMIT):
+        # The first search waits for the index to be built; later ones are served from
+        # the current index while a stale one is rescanned in the background.
+        if self.workspace_index.last_refresh is None:
+            await asyncio.shield(self.refresh_workspace_index())
+        elif self.workspace_index.stale():
+            self.refresh_workspace_index()
+        directory = directory or self.workspaces[agent_name]
+        matches = await self.workspace_files.run(self.workspace_index.search, keyword, directory, limit)
+        return format_search_results(keyword, matches)
+
     def scrape_webpage(self, url):
         return scrape_webpage(url)
 
-    def save_workspace_file(self, agent_name, file_name, content):
+    async def save_workspace_file(self, agent_name, file_name, content):
         workspace_path = self.workspaces[agent_name]
         file_path = os.path.join(workspace_path, file_name)
-        with open(file_path, 'w') as file:
-            file.write(content)
+        await self.workspace_files.write(file_path, content)
         self.print_formatted('System', f"{agent_name} saved file to workspace: {file_name}")
 
-    def load_workspace_file(self, agent_name, file_name):
+    async def load_workspace_file(self, agent_name, file_name):
         workspace_path = self.workspaces[agent_name]
         file_path = os.path.join(workspace_path, file_name)
         try:
-            with open(file_path, 'r') as file:
-                content = file.read()
+            content = await self.workspace_files.read(file_path)
             self.print_formatted('System', f"{agent_name} loaded file from workspace: {file_name}")
             return content
         except FileNotFoundError:
             self.print_formatted('System', f"File not found in {agent_name}'s workspace: {file_name}")
             return None
 
-    def list_workspace_files(self, agent_name):
+    async def list_workspace_files(self, agent_name):
         workspace_path = self.workspaces[agent_name]
-        files = os.listdir(workspace_path)
+        files = await self.workspace_files.listdir(workspace_path)
         self.print_formatted('System', f"Files in {agent_name}'s workspace: {', '.join(files)}")
         return files
 
-    def edit_workspace_file(self, agent_name, file_name):
+    async def edit_workspace_file(self, agent_name, file_name):
         workspace_path = self.workspaces[agent_name]
         file_path = os.path.join(workspace_path, file_name)
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as file:
-                content = file.read()
+        try:
+            content = await self.workspace_files.read(file_path)
             self.print_formatted('System', f"{agent_name} opened file for editing: {file_name}")
             return content
-        else:
+        except FileNotFoundError:
             self.print_formatted('System', f"File not found in {agent_name}'s workspace: {file_name}")
             return None
 
-    def save_edited_workspace_file(self, agent_name, file_name, content):
+    async def save_edited_workspace_file(self, agent_name, file_name, content):
         workspace_path = self.workspaces[agent_name]
         file_path = os.path.join(workspace_path, file_name)
-        with open(file_path, 'w') as file:
-            file.write(content)
+        await self.workspace_files.write(file_path, content)
         self.print_formatted('System', f"{agent_name} saved edited file: {file_name}")
 
+    async def save_file(self, file_path, content):
+        """
+        The save_file command, written through the workspace file layer.
+
+        Returns:
+            str: A message indicating success or an error message.
+        """
+        try:
+            await self.workspace_files.write(file_path, content)
+            return f"File saved successfully: {file_path}"
+        except OSError as e:
+            return f"Error occurred while saving file: {str(e)}"
+
+    async def edit_file(self, file_path, old_content, new_content):
+        """
+        The edit_file command: replace old_content with new_content, as one
+        read-modify-write through the workspace file layer.
+
+        Returns:
+            str: A message indicating success or an error message.
+        """
+        try:
+            await self.workspace_files.edit(file_path, lambda content: content.replace(old_content, new_content))
+            return f"File edited successfully: {file_path}"
+        except OSError as e:
+            return f"Error occurred while editing file: {str(e)}"
+
     def run_python_file(self, agent_name, file_name):
         workspace_path = self.workspaces[agent_name]
         file_path = os.path.join(workspace_path, file_name)
@@ -0,0 +1,85 @@
+import asyncio
+from config import AGENT_INBOX_SIZE
+
+# Chat priorities. Direct messages are the ones agents send as action items;
+# chatter is the status traffic the simulation generates between turns.
+MESSAGE = 'message'
+CHATTER = 'chatter'
+
+class Envelope:
+    """
+    One item in an agent's inbox.
+
+    A 'chat' envelope carries (sender, text) pairs, more than one if messages were
+    coalesced. A 'turn' envelope carries a coroutine function that the agent's actor
+    awaits with the agent, setting future to its result. A 'stop' envelope ends the
+    actor.
+    """
+
+    def __init__(self, kind, messages=None, work=None, future=None):
+        self.kind = kind
+        self.messages = messages
+        self.work = work
+        self.future = future
+
+
+class Inbox:
+    """
+    Bounded inbox of an agent actor.
+
+    Turn and stop envelopes are put with backpressure: the caller waits while the
+    inbox is full. Chat never makes the sender wait, so agents cannot deadlock
+    sending to each other. A message from a sender whose earlier chat is still queued
+    is coalesced into that envelope. When the inbox is full, chatter is shed and a
+    direct message is coalesced into the newest queued chat envelope, or shed if
+    there is none. Chat remains in the Environment's chat history either way.
+    """
+
+    def __init__(self, maxsize=AGENT_INBOX_SIZE):
+        self.queue = asyncio.Queue(maxsize)
+        self.pending = {}
+        self.latest_chat = None
+        self.delivered = 0
+        self.coalesced = 0
+        self.shed = 0
+
+    async def put(self, envelope):
+        await self.queue.put(envelope)
+
+    def offer(self, sender, text, priority=MESSAGE):
+        """
+        Deliver a chat message without waiting.
+
+        Returns:
+            bool: False if the message was shed.
+        """
+        envelope = self.pending.get(sender)
+        if envelope is None and self.queue.full():
+            envelope = self.latest_chat if priority == MESSAGE else None
+            if envelope is None:
+                self.shed += 1
+                return False
+        if envelope is not None:
+            envelope.messages.append((sender, text))
+            self.coalesced += 1
+            return True
+
+        envelope = Envelope('chat', messages=[(sender, text)])
+        self.queue.put_nowait(envelope)
+        self.pending[sender] = envelope
+        self.latest_chat = envelope
+        self.delivered += 1
+        return True
+
+    async def get(self):
+        envelope = await self.queue.get()
+        if envelope.kind == 'chat':
+            sender = envelope.messages[0][0]
+            if self.pending.get(sender) is envelope:
+                del self.pending[sender]
+            if self.latest_chat is envelope:
+                self.latest_chat = None
+        return envelope
+
+    def stats(self):
+        return {"delivered": self.delivered, "coalesced": self.coalesced, "shed": self.shed}
@@ -0,0 +1,69 @@
+import hashlib
+import os
+from collections import OrderedDict
+from config import LINT_CACHE_ENTRIES, LINT_RCFILE
+
+class LintCache:
+    """
+    In-memory LRU of run_pylint results keyed by file content and Pylint configuration.
+
+    The key is a hash of the file's bytes together with the Pylint version and the
+    contents of the configured rcfile, so an unchanged file is never linted twice
+    and any edit or configuration change misses. Content hashes are remembered per
+    path with the file's mtime and size, so a hit on an unchanged file does not
+    reread it. The configuration part is computed on the first lint, so creating a
+    cache neither imports nor requires Pylint.
+    """
+
+    def __init__(self, max_entries=LINT_CACHE_ENTRIES, rcfile=LINT_RCFILE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.digests = {}
+        self.hits = 0
+        self.misses = 0
+        self.rcfile = rcfile
+        self.config_key = None
+
+    def compute_config_key(self):
+        from importlib import metadata
+        try:
+            version = metadata.version('pylint')
+        except metadata.PackageNotFoundError:
+            # The lint run itself reports the missing package.
+            version = ''
+        config = hashlib.sha256(version.encode('utf-8'))
+        if self.rcfile:
+            with open(self.rcfile, 'rb') as file:
+                config.update(file.read())
+        return config.hexdigest()
+
+    def key(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        remembered = self.digests.get(path)
+        if remembered is None or remembered[0] != signature:
+            with open(path, 'rb') as file:
+                digest = hashlib.sha256(file.read()).hexdigest()
+            remembered = (signature, digest)
+            self.digests[path] = remembered
+        if self.config_key is None:
+            self.config_key = self.compute_config_key()
+        return f"{self.config_key}:{remembered[1]}"
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
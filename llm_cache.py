@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from config import LLM_CACHE_ENABLED, LLM_CACHE_MEMORY_ENTRIES, LLM_CACHE_DISK_ENTRIES, LLM_CACHE_TTL
+import database
+
+class ResponseCache:
+    """
+    Content-addressed cache of LLM responses.
+
+    Keys are a hash of the provider, model, temperature and the fully rendered prompt
+    messages. Lookups go to an in-memory LRU first and then to a SQLite store that
+    survives across runs. Entries older than ttl seconds are ignored and the disk
+    store is trimmed to disk_entries, least recently used first.
+    """
+
+    def __init__(self, memory_entries=LLM_CACHE_MEMORY_ENTRIES, disk_entries=LLM_CACHE_DISK_ENTRIES, ttl=LLM_CACHE_TTL):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.puts_since_trim = 0
+        os.makedirs(database.connections.database_dir, exist_ok=True)
+        conn = database.get_connection('llm_cache')
+        with conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS responses
+                         (key TEXT PRIMARY KEY, response TEXT, created REAL, accessed REAL)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed)")
+
+    @staticmethod
+    def make_key(provider, model, temperature, messages):
+        payload = json.dumps([provider, model, temperature, messages], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is not None:
+            response, created = entry
+            if now - created <= self.ttl:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return response
+            del self.memory[key]
+
+        conn = database.get_connection('llm_cache')
+        row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None and now - row[1] <= self.ttl:
+            with conn:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            self.disk_hits += 1
+            return row[0]
+
+        self.misses += 1
+        return None
+
+    def put(self, key, response):
+        now = time.time()
+        self._remember(key, response, now)
+        conn = database.get_connection('llm_cache')
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO responses (key, response, created, accessed) VALUES (?, ?, ?, ?)", (key, response, now, now))
+            self.puts_since_trim += 1
+            if self.puts_since_trim >= max(1, self.disk_entries // 10):
+                self.puts_since_trim = 0
+                conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                conn.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.disk_entries,))
+
+    def _remember(self, key, response, created):
+        self.memory[key] = (response, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+_response_cache = None
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None and LLM_CACHE_ENABLED:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -1,6 +1,9 @@
 import asyncio
 from agent import Agent
+from api_integrations import close_clients
 from environment import Environment
+from scheduler import TurnScheduler
+from topology import build_topology
 import config
 import database
 
@@ -17,52 +20,37 @@ async def run_simulation():
     env = Environment()
     agents = []
 
-    api_choice = "groq" #input("Enter the API choice (groq/openai/ollama/langchain/claude): ") # claude isnt working due to rate limiting error(fixing) and i prefer groq for testing.
+    api_choice = "groq" #input("Enter the API choice (groq/openai/ollama/langchain/claude/mock): ") # claude isnt working due to rate limiting error(fixing) and i prefer groq for testing.
 
     for agent_config in config.AGENTS:
         agent = Agent(agent_config['name'], agent_config['role'], agent_config['responsibilities'], agent_config['skills'], env, api_choice)
         agents.append(agent)
         env.add_agent(agent)
+    env.set_topology(build_topology(config.AGENTS))
 
-    env.load_emails()
+    try:
+        workday_tasks = [start_workday(agent) for agent in agents]
+        await asyncio.gather(*workday_tasks)
 
-    workday_tasks = [start_workday(agent) for agent in agents]
-    await asyncio.gather(*workday_tasks)
-
-    collaboration_tasks = []
-    for agent in agents:
-        collaboration_tasks.extend([
-            agent.attend_meeting(),
-            agent.collaborate_with_team(),
-            agent.work_on_projects(),
-        ])
-    await asyncio.gather(*collaboration_tasks)
-
-    while True:
+        collaboration_tasks = []
         for agent in agents:
-            await agent.think()
-            await agent.act()
-
-            if agent.should_take_break():
-                await agent.take_break()
-
-            for other_agent in agents:
-                if other_agent != agent:
-                    message = await agent.generate_message(other_agent)
-                    await env.send_message(agent.name, other_agent.name, message)
-
-                    if agent.should_share_file(other_agent):
-                        file_name, file_content = await agent.generate_file(other_agent)
-                        env.save_workspace_file(agent.name, file_name, file_content)
-                        env.print_formatted(agent.name, f"Shared file '{file_name}' with {other_agent.name}")
-
-            important_info = await agent.generate_important_info()
-            env.save_important_info(important_info)
-
-        await asyncio.sleep(1)
-
-    end_of_day_tasks = [end_workday(agent) for agent in agents]
-    await asyncio.gather(*end_of_day_tasks)
+            collaboration_tasks.extend([
+                agent.attend_meeting(),
+                agent.collaborate_with_team(),
+                agent.work_on_projects(),
+            ])
+        await asyncio.gather(*collaboration_tasks)
+
+        scheduler = TurnScheduler(env, agents)
+        while config.SIMULATION_ROUNDS is None or scheduler.round < config.SIMULATION_ROUNDS:
+            await scheduler.run_round()
+
+        end_of_day_tasks = [end_workday(agent) for agent in agents]
+        await asyncio.gather(*end_of_day_tasks)
+    finally:
+        await env.stop_actors()
+        env.close()
+        await close_clients()
 
 if __name__ == "__main__":
     asyncio.run(run_simulation())
@@ -0,0 +1,78 @@
+from collections import deque
+from config import AGENT_MEMORY_TOKEN_BUDGET, AGENT_MEMORY_SUMMARY_TOKENS, AGENT_MEMORY_SUMMARY_FRAGMENT_CHARS
+from rate_limiter import estimate_tokens
+
+class AgentMemory:
+    """
+    Rolling memory of an agent's actions or thoughts, bounded by a token budget.
+
+    The most recent items are kept verbatim. Once they exceed the budget the oldest are
+    folded into a running summary of short fragments, which is itself bounded by
+    summary_tokens. Token counts are kept incrementally and the rendered text is cached
+    until the next append, so prompt building costs the same on round one and round
+    one thousand.
+
+    Behaves like a read-only list of the verbatim items, except that len() counts
+    every item ever appended.
+    """
+
+    def __init__(self, token_budget=AGENT_MEMORY_TOKEN_BUDGET, summary_tokens=AGENT_MEMORY_SUMMARY_TOKENS):
+        self.recent_budget = token_budget - summary_tokens
+        self.summary_budget = summary_tokens
+        self.recent = deque()
+        self.recent_tokens = 0
+        self.summary = deque()
+        self.summary_tokens = 0
+        self.count = 0
+        self.rendered = {}
+
+    def append(self, item):
+        text = str(item)
+        if estimate_tokens(text) > self.recent_budget:
+            text = text[:self.recent_budget * 4] + "..."
+        tokens = estimate_tokens(text)
+        self.recent.append((text, tokens))
+        self.recent_tokens += tokens
+        self.count += 1
+
+        while self.recent_tokens > self.recent_budget and len(self.recent) > 1:
+            old_text, old_tokens = self.recent.popleft()
+            self.recent_tokens -= old_tokens
+            self.fold(old_text)
+        self.rendered.clear()
+
+    def fold(self, text):
+        # Keep the gist of an evicted item: its first sentence, truncated.
+        fragment = " ".join(text.split())
+        end = fragment.find(". ")
+        if end != -1:
+            fragment = fragment[:end + 1]
+        if len(fragment) > AGENT_MEMORY_SUMMARY_FRAGMENT_CHARS:
+            fragment = fragment[:AGENT_MEMORY_SUMMARY_FRAGMENT_CHARS] + "..."
+        tokens = estimate_tokens(fragment)
+        self.summary.append((fragment, tokens))
+        self.summary_tokens += tokens
+
+        while self.summary_tokens > self.summary_budget and len(self.summary) > 1:
+            _, old_tokens = self.summary.popleft()
+            self.summary_tokens -= old_tokens
+
+    def render(self, separator=", "):
+        if separator not in self.rendered:
+            parts = [text for text, _ in self.recent]
+            if self.summary:
+                parts.insert(0, "Earlier: " + " ".join(fragment for fragment, _ in self.summary))
+            self.rendered[separator] = separator.join(parts)
+        return self.rendered[separator]
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __iter__(self):
+        return (text for text, _ in self.recent)
+
+    def __getitem__(self, index):
+        return self.recent[index][0]
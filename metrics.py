@@ -0,0 +1,54 @@
+from collections import deque
+
+class LLMCallMetrics:
+    """
+    Process-wide counters and a bounded latency sample for LLM calls.
+
+    Only the most recent max_samples latencies are kept, so long simulations do not
+    grow memory; percentiles are computed over that window. Streamed calls also
+    record their time to first token and output tokens per second.
+    """
+
+    def __init__(self, max_samples=100000):
+        self.max_samples = max_samples
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=self.max_samples)
+        self.first_token_latencies = deque(maxlen=self.max_samples)
+        self.token_rates = deque(maxlen=self.max_samples)
+
+    def record(self, latency, first_token_latency=None, tokens=None):
+        self.calls += 1
+        self.latencies.append(latency)
+        if first_token_latency is not None:
+            self.first_token_latencies.append(first_token_latency)
+            if tokens and latency > first_token_latency:
+                self.token_rates.append(tokens / (latency - first_token_latency))
+
+    def record_error(self):
+        self.errors += 1
+
+    def percentile(self, percent, samples=None):
+        samples = self.latencies if samples is None else samples
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_p50": self.percentile(50),
+            "latency_p95": self.percentile(95),
+            "latency_p99": self.percentile(99),
+            "ttft_p50": self.percentile(50, self.first_token_latencies),
+            "ttft_p95": self.percentile(95, self.first_token_latencies),
+            "tokens_per_second_p50": self.percentile(50, self.token_rates),
+        }
+
+llm_metrics = LLMCallMetrics()
@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+from config import AGENTS, MOCK_PROVIDER
+
+MOCK_COMMANDS = ['check_code_quality', 'run_unit_tests', 'generate_documentation', 'search_files', 'analyze_code']
+MOCK_FILES = ['main.py', 'agent.py', 'environment.py', 'database.py', 'skills.py', 'tests']
+MOCK_TOPICS = ['the API design', 'the release plan', 'the database schema', 'the CI pipeline', 'the frontend build',
+               'test coverage', 'the deployment checklist', 'the data pipeline', 'the sprint backlog', 'error handling']
+MOCK_SENTENCES = [
+    "I reviewed {topic} and found a few gaps we should close before the next milestone.",
+    "Can you take a look at {topic} and share your feedback by end of day?",
+    "I finished my part of {topic}; the remaining work is tracked in the backlog.",
+    "We need to align on {topic} before anyone starts implementation.",
+    "I propose we simplify {topic} to reduce the risk of regressions.",
+]
+
+# Structured requests embed their JSON schema after this phrase (see AGENT_MESSAGES).
+SCHEMA_MARKER = "must match this JSON schema:"
+
+class MockRateLimitError(Exception):
+    status_code = 429
+
+class MockLLMClient:
+    """
+    Offline stand-in for an LLM provider, selected with api_choice "mock".
+
+    Responses are deterministic for a given seed and prompt and contain well-formed
+    action items (message|..., email|..., command|...). Each call sleeps for a latency
+    drawn from a fixed, normal or long-tail distribution and fails with a simulated
+    429 at the configured error rate. stream() yields the same response word by word.
+    Requests that carry a JSON schema get a conforming JSON document instead.
+    """
+
+    def __init__(self, **overrides):
+        settings = dict(MOCK_PROVIDER, **overrides)
+        if settings['latency'] not in ('fixed', 'normal', 'long_tail'):
+            raise ValueError(f"Invalid mock latency distribution: {settings['latency']}")
+        self.seed = settings['seed']
+        self.latency = settings['latency']
+        self.latency_ms = settings['latency_ms']
+        self.latency_stddev_ms = settings['latency_stddev_ms']
+        self.tail_probability = settings['tail_probability']
+        self.tail_multiplier = settings['tail_multiplier']
+        self.error_rate = settings['error_rate']
+        self.stream_tokens_per_second = settings['stream_tokens_per_second']
+        self.malformed_rate = settings['malformed_rate']
+        self.rng = random.Random(self.seed)
+        self.calls = 0
+        self.errors = 0
+
+    def sample_latency(self):
+        if self.latency == 'fixed':
+            latency_ms = self.latency_ms
+        elif self.latency == 'normal':
+            latency_ms = self.rng.gauss(self.latency_ms, self.latency_stddev_ms)
+        else:
+            latency_ms = self.rng.expovariate(1 / self.latency_ms)
+            if self.rng.random() < self.tail_probability:
+                latency_ms *= self.tail_multiplier
+        return max(0.0, latency_ms) / 1000
+
+    async def complete(self, system_message, user_message):
+        self.calls += 1
+        await asyncio.sleep(self.sample_latency())
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            raise MockRateLimitError("Mock provider rate limit exceeded (429)")
+        response = self.generate(system_message, user_message)
+        if response.startswith('{') and self.rng.random() < self.malformed_rate:
+            response = response[:len(response) // 2]
+        return response
+
+    async def stream(self, system_message, user_message):
+        # The sampled latency is the time to first token; the rest of the response
+        # follows word by word at stream_tokens_per_second.
+        response = await self.complete(system_message, user_message)
+        delay = 1 / self.stream_tokens_per_second if self.stream_tokens_per_second else 0
+        for index, word in enumerate(re.split(r"(?<=\s)", response)):
+            if index and delay:
+                await asyncio.sleep(delay)
+            yield word
+
+    def generate(self, system_message, user_message):
+        digest = hashlib.sha256(f"{self.seed}\n{system_message}\n{user_message}".encode('utf-8')).hexdigest()
+        rng = random.Random(digest)
+        match = re.search(r"You are (\w+),", system_message)
+        sender = match.group(1) if match else None
+        teammates = [agent['name'] for agent in AGENTS if agent['name'] != sender] or ['Alice']
+
+        schema_start = user_message.find(SCHEMA_MARKER)
+        if schema_start != -1:
+            schema, _ = json.JSONDecoder().raw_decode(user_message, user_message.index('{', schema_start))
+            return json.dumps(self.generate_value(schema, rng, teammates))
+
+        return self.generate_text(rng, teammates)
+
+    def generate_text(self, rng, teammates):
+        lines = [rng.choice(MOCK_SENTENCES).format(topic=rng.choice(MOCK_TOPICS)), ""]
+        for _ in range(rng.randint(1, 2)):
+            kind = rng.choice(['message', 'email', 'command'])
+            sentence = rng.choice(MOCK_SENTENCES).format(topic=rng.choice(MOCK_TOPICS))
+            if kind == 'message':
+                lines.append(f"message|{rng.choice(teammates)}|{sentence}")
+            elif kind == 'email':
+                lines.append(f"email|{rng.choice(teammates)}|Update on {rng.choice(MOCK_TOPICS)}|{sentence}")
+            else:
+                lines.append(f"command|{rng.choice(MOCK_COMMANDS)}|{rng.choice(MOCK_FILES)}")
+        return "\n".join(lines)
+
+    def generate_value(self, schema, rng, teammates):
+        # Build a document that conforms to the requested schema.
+        if 'enum' in schema:
+            return rng.choice(schema['enum'])
+        kind = schema.get('type', 'string')
+        if kind == 'object':
+            return {key: self.generate_value(value, rng, teammates) for key, value in schema.get('properties', {}).items()}
+        if kind == 'array':
+            count = rng.randint(max(1, schema.get('minItems', 1)), max(2, schema.get('minItems', 1)))
+            count = min(count, schema.get('maxItems', count))
+            return [self.generate_value(schema.get('items', {}), rng, teammates) for _ in range(count)]
+        if kind == 'integer' or kind == 'number':
+            return rng.randint(1, 10)
+        if kind == 'boolean':
+            return rng.random() < 0.5
+        return self.generate_text(rng, teammates)
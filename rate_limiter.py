@@ -0,0 +1,83 @@
+import asyncio
+import contextlib
+import time
+from config import RATE_LIMITS, MAX_CONCURRENT_LLM_CALLS
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # Never ask for more than the bucket can hold, otherwise the caller would wait forever.
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.refill_per_second)
+
+    def consume(self, amount):
+        # Debit usage that is only known after the call; the bucket may go negative,
+        # which delays the next acquire until the debt has been refilled.
+        self._refill()
+        self.tokens -= amount
+
+class RateLimiter:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_concurrent=None):
+        self.semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute else None
+
+    async def acquire(self, tokens=0):
+        if self.request_bucket:
+            await self.request_bucket.acquire(1)
+        if self.token_bucket and tokens:
+            await self.token_bucket.acquire(tokens)
+
+    def record_usage(self, tokens):
+        if self.token_bucket and tokens:
+            self.token_bucket.consume(tokens)
+
+_rate_limiters = {}
+_global_semaphore = None
+
+def get_rate_limiter(provider):
+    if provider not in _rate_limiters:
+        limits = RATE_LIMITS.get(provider, {})
+        _rate_limiters[provider] = RateLimiter(limits.get('requests_per_minute'), limits.get('tokens_per_minute'), limits.get('max_concurrent'))
+    return _rate_limiters[provider]
+
+@contextlib.asynccontextmanager
+async def concurrency_slot(provider):
+    # Holds one slot of the global and of the per-provider in-flight call limits.
+    global _global_semaphore
+    if _global_semaphore is None and MAX_CONCURRENT_LLM_CALLS:
+        _global_semaphore = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+    provider_semaphore = get_rate_limiter(provider).semaphore
+    async with contextlib.AsyncExitStack() as stack:
+        if _global_semaphore:
+            await stack.enter_async_context(_global_semaphore)
+        if provider_semaphore:
+            await stack.enter_async_context(provider_semaphore)
+        yield
+
+def reset_rate_limiters(max_concurrent_llm_calls=MAX_CONCURRENT_LLM_CALLS):
+    # Limiters hold asyncio primitives, so they must be rebuilt for a new event loop.
+    global _global_semaphore
+    _rate_limiters.clear()
+    _global_semaphore = asyncio.Semaphore(max_concurrent_llm_calls) if max_concurrent_llm_calls else None
+
+def estimate_tokens(text):
+    # Rough heuristic (~4 characters per token) that avoids pulling in a tokenizer.
+    return len(text) // 4 + 1
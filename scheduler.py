@@ -0,0 +1,116 @@
+import asyncio
+import time
+from config import MAX_CONCURRENT_TURNS, BATCH_MESSAGES, DIGEST_INTERVAL, DIGEST_REPLACES_STATUS_MESSAGES, DIGEST_ITEM_CHARS
+from inbox import CHATTER
+
+class TurnScheduler:
+    """
+    Run agent turns concurrently, one round at a time.
+
+    Each turn is posted to the agent's actor (Environment.run_turn), so it runs in
+    order with the messages the agent receives. Every DIGEST_INTERVAL rounds the
+    round ends with a team digest.
+
+    Within a turn the steps that depend on each other stay ordered (an agent thinks
+    before it acts), while independent work such as messages to different teammates
+    runs concurrently. The number of in-flight LLM calls is bounded globally and per
+    provider by the rate limiter, so throughput scales with the allowed concurrency.
+    """
+
+    def __init__(self, env, agents, max_concurrent_turns=MAX_CONCURRENT_TURNS):
+        self.env = env
+        self.agents = agents
+        self.turn_semaphore = asyncio.Semaphore(max_concurrent_turns) if max_concurrent_turns else None
+        self.round = 0
+        self.round_stats = []
+
+    async def run_round(self):
+        self.round += 1
+        start = time.perf_counter()
+        results = await asyncio.gather(*[self.env.run_turn(agent.name, self.run_limited_turn) for agent in self.agents], return_exceptions=True)
+
+        failed = 0
+        for agent, result in zip(self.agents, results):
+            if isinstance(result, Exception):
+                failed += 1
+                self.env.print_formatted('System', f"{agent.name}'s turn failed in round {self.round}: {result}")
+
+        digest = None
+        if DIGEST_INTERVAL and self.round % DIGEST_INTERVAL == 0:
+            try:
+                digest = await self.write_digest()
+            except Exception as e:
+                self.env.print_formatted('System', f"The team digest failed in round {self.round}: {e}")
+        wall_time = time.perf_counter() - start
+
+        stats = {
+            "round": self.round,
+            "turns": len(self.agents),
+            "failed_turns": failed,
+            "digest_id": digest["id"] if digest else None,
+            "wall_time": wall_time,
+        }
+        self.round_stats.append(stats)
+        self.env.print_formatted('System', f"Round {self.round} completed: {len(self.agents) - failed}/{len(self.agents)} turns in {wall_time:.2f}s")
+        return stats
+
+    async def run_limited_turn(self, agent):
+        if self.turn_semaphore:
+            async with self.turn_semaphore:
+                await self.run_turn(agent)
+        else:
+            await self.run_turn(agent)
+
+    async def run_turn(self, agent):
+        await agent.think()
+        await agent.act()
+
+        if agent.should_take_break():
+            await agent.take_break()
+
+        other_agents = self.env.neighbours(agent.name)
+        if DIGEST_INTERVAL and DIGEST_REPLACES_STATUS_MESSAGES:
+            # Status travels in the team digest instead.
+            messages = {}
+        elif BATCH_MESSAGES:
+            messages = await agent.generate_messages(other_agents)
+        else:
+            messages = dict(zip([other_agent.name for other_agent in other_agents],
+                                await asyncio.gather(*[agent.generate_message(other_agent) for other_agent in other_agents])))
+        await asyncio.gather(*[self.share_with(agent, other_agent, messages.get(other_agent.name)) for other_agent in other_agents])
+
+        important_info = await agent.generate_important_info()
+        self.env.save_important_info(important_info)
+
+    async def share_with(self, agent, other_agent, message):
+        if message is not None:
+            await self.env.send_message(agent.name, other_agent.name, message, CHATTER)
+
+        if agent.should_share_file(other_agent):
+            file_name, file_content = await agent.generate_file(other_agent)
+            await self.env.save_workspace_file(agent.name, file_name, file_content)
+            self.env.print_formatted(agent.name, f"Shared file '{file_name}' with {other_agent.name}")
+
+    async def write_digest(self):
+        """
+        Condense every agent's latest action and the important info saved since the
+        previous digest into one team digest, with a single LLM call by the first agent.
+        Info beyond the per-digest limit is left, oldest first, for the next digest.
+
+        Returns:
+            dict: The stored digest, or None if there was nothing to report.
+        """
+        previous = self.env.latest_digest
+        last_info_id = previous["last_info_id"] if previous else 0
+        info = self.env.get_important_info(after=last_info_id, limit=len(self.agents) * DIGEST_INTERVAL)
+        actions = [f"- {agent.name} ({agent.role}): {agent.actions[-1][:DIGEST_ITEM_CHARS]}" for agent in self.agents if agent.actions]
+        if not info and not actions:
+            return None
+
+        info_lines = [f"- {item['content'][:DIGEST_ITEM_CHARS]}" for item in info]
+        context = "\n".join(
+            [f"Write the team digest after round {self.round}: a concise status update for the whole team covering progress, decisions, blockers and who needs what from whom.",
+             "", "Latest actions:"] + (actions or ["- none"]) + ["", "Important information:"] + (info_lines or ["- none"])
+        )
+        content = await self.agents[0].call_api(context)
+        return self.env.save_digest(self.round, info[-1]["id"] if info else last_info_id, content)
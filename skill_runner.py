@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+from config import SKILL_LIMITS, LINT_JOBS, LINT_RCFILE
+from lint_cache import LintCache
+from skills import LINT_SKILLS, format_lint_summary
+
+class SkillTimeoutError(Exception):
+    """Raised when a skill exceeds its timeout and its process is killed."""
+
+
+class SkillRunner:
+    """
+    Run CPU- and subprocess-heavy skills (pylint, unit tests, pip, pydoc, git) in
+    child processes.
+
+    Each run is a separate process awaited with asyncio, so the event loop keeps
+    serving other agents while it works. Every skill has its own timeout and
+    concurrency cap from SKILL_LIMITS. A run that times out or is cancelled is killed
+    together with any processes it started.
+
+    The lint skills share one Pylint engine (skills.run_pylint) whose results are
+    cached in this process, so asking about an unchanged file never starts a process.
+    """
+
+    def __init__(self, limits=SKILL_LIMITS):
+        self.limits = limits
+        self.semaphores = {name: asyncio.Semaphore(limit['max_concurrent']) for name, limit in limits.items()}
+        self.processes = set()
+        self.lint_cache = LintCache()
+
+    def handles(self, name):
+        return name in self.limits or name in LINT_SKILLS
+
+    async def run(self, name, *args):
+        """
+        Run a skills.py function in a child process.
+
+        Args:
+            name (str): The skill name, a key of SKILL_LIMITS.
+            *args: JSON-serializable arguments for the skill.
+
+        Returns:
+            str: The skill's result, or an error message if the process failed.
+        """
+        if name in LINT_SKILLS:
+            return await self.run_lint_skill(name, *args)
+        timeout = self.limits[name]['timeout']
+        async with self.semaphores[name]:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), name, json.dumps(args),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=os.name == 'posix',
+            )
+            self.processes.add(process)
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                self.kill(process)
+                await process.wait()
+                if isinstance(e, asyncio.TimeoutError):
+                    raise SkillTimeoutError(f"{name} timed out after {timeout}s") from None
+                raise
+            finally:
+                self.processes.discard(process)
+
+        if process.returncode != 0:
+            error = stderr.decode('utf-8', errors='replace').strip().splitlines()
+            return f"Error occurred while running {name}: {error[-1] if error else f'exit status {process.returncode}'}"
+        return json.loads(stdout)
+
+    async def lint(self, paths):
+        """
+        Lint Python files, running Pylint once with parallel jobs over those not in the cache.
+
+        Args:
+            paths (list): The paths of the files to lint.
+
+        Returns:
+            dict: The run_pylint result for each path.
+        """
+        results = {}
+        keys = {}
+        for path in paths:
+            key = self.lint_cache.key(path)
+            cached = self.lint_cache.get(key) if key else None
+            if cached is None:
+                keys[path] = key
+            else:
+                results[path] = cached
+
+        if keys:
+            linted = await self.run('run_pylint', list(keys), LINT_JOBS, LINT_RCFILE)
+            if isinstance(linted, str):
+                raise RuntimeError(linted)
+            for path, result in linted.items():
+                if keys[path]:
+                    self.lint_cache.put(keys[path], result)
+            results.update(linted)
+        return results
+
+    async def run_lint_skill(self, name, path):
+        try:
+            results = await self.lint([path])
+        except RuntimeError as e:
+            return str(e)
+        return format_lint_summary(name, path, results[path])
+
+    def kill(self, process):
+        if process.returncode is not None:
+            return
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    def close(self):
+        for process in list(self.processes):
+            self.kill(process)
+
+def run_skill(name, args):
+    # Skills log and their tools (pip, unittest) print to stdout, so file
+    # descriptor 1 is pointed at stderr while the skill runs and only the JSON
+    # result is written to the real stdout.
+    import skills
+    result_stream = os.fdopen(os.dup(1), 'w')
+    sys.stdout.flush()
+    os.dup2(2, 1)
+    result = getattr(skills, name)(*args)
+    sys.stdout.flush()
+    json.dump(result, result_stream)
+    result_stream.close()
+
+if __name__ == '__main__':
+    run_skill(sys.argv[1], json.loads(sys.argv[2]))
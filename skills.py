@@ -1,11 +1,11 @@
-import requests
 import os
 import re
-import git
-from pylint import lint
 import subprocess
 import logging
 
+# requests, git and pylint are slow to import, so each skill imports what it uses
+# when it first runs.
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -19,6 +19,7 @@ def scrape_webpage(url):
     Returns:
         str: The scraped webpage content if successful, otherwise an error message.
     """
+    import requests
     try:
         response = requests.get(url)
         if response.status_code == 200:
@@ -75,6 +76,22 @@ def edit_file(file_path, old_content, new_content):
         logger.exception(f"Error occurred while editing file: {file_path}")
         return f"Error occurred while editing file: {str(e)}"
 
+def format_search_results(keyword, matches):
+    """
+    Format search matches as "path:line: text" lines.
+
+    Args:
+        keyword (str): The keyword that was searched for.
+        matches (list): (path, line number, line) tuples.
+
+    Returns:
+        str: The matching lines if any, otherwise a message indicating no matches found.
+    """
+    if not matches:
+        return f"No matching files found containing the keyword: {keyword}"
+    lines = [f"{path}:{line_number}: {line.strip()[:200]}" for path, line_number, line in matches]
+    return "Matching files:\n" + "\n".join(lines)
+
 def search_files(directory, keyword):
     """
     Search for files containing a specific keyword in the given directory.
@@ -84,26 +101,25 @@ def search_files(directory, keyword):
         keyword (str): The keyword to search for in file contents.
         
     Returns:
-        str: The list of matching files if any, otherwise a message indicating no matches found.
+        str: The matching lines with their files and line numbers if any, otherwise a message indicating no matches found.
     """
     try:
-        matching_files = []
+        matches = []
         for root, dirs, files in os.walk(directory):
             for file in files:
                 file_path = os.path.join(root, file)
-                with open(file_path, 'r') as f:
-                    content = f.read()
-                    if keyword in content:
-                        matching_files.append(file_path)
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+                if b'\0' in data:
+                    continue
+                content = data.decode('utf-8', errors='replace')
+                if keyword in content:
+                    for line_number, line in enumerate(content.splitlines(), 1):
+                        if keyword in line:
+                            matches.append((file_path, line_number, line))
 
-        if matching_files:
-            result = "Matching files:\n" + "\n".join(matching_files) 
-            logger.info(f"Search completed. {len(matching_files)} files found containing keyword: {keyword}")
-        else:
-            result = "No matching files found containing the keyword: {keyword}"
-            logger.info(f"Search completed. No files found containing keyword: {keyword}")
-        
-        return result
+        logger.info(f"Search completed. {len({path for path, _, _ in matches})} files found containing keyword: {keyword}")
+        return format_search_results(keyword, matches)
     except Exception as e:
         logger.exception(f"Error occurred during file search in directory: {directory}")
         return f"Error occurred during file search: {str(e)}"
@@ -119,6 +135,7 @@ def git_clone(repository_url, target_directory):
     Returns:
         str: A message indicating success or an error message.
     """
+    import git
     try:
         git.Repo.clone_from(repository_url, target_directory)
         logger.info(f"Repository cloned successfully to {target_directory}")
@@ -137,6 +154,7 @@ def git_pull(repository_path):
     Returns:
         str: A message indicating success or an error message.
     """
+    import git
     try:
         repo = git.Repo(repository_path)
         origin = repo.remotes.origin
@@ -158,6 +176,7 @@ def git_push(repository_path, commit_message):
     Returns:
         str: A message indicating success or an error message.
     """
+    import git
     try:
         repo = git.Repo(repository_path)
         repo.git.add(all=True)
@@ -170,6 +189,102 @@ def git_push(repository_path, commit_message):
         logger.exception(f"Error occurred during git push in repository: {repository_path}")
         return f"Error occurred during git push: {str(e)}"
 
+# Headings used by the two skills that report on the shared Pylint engine.
+LINT_SKILLS = {
+    'analyze_code': ("Code Analysis Results", "Major Issues Found"),
+    'check_code_quality': ("Code Quality Results", "Issues Found"),
+}
+LINT_ISSUE_CATEGORIES = ('fatal', 'error', 'warning')
+
+def pylint_score(module_stats):
+    """
+    Compute a module's Pylint score with Pylint's default evaluation formula.
+
+    Args:
+        module_stats (dict): The module's message counts by category and its statement count.
+
+    Returns:
+        float: The score out of 10, or None if the module has no statements.
+    """
+    if not module_stats or not module_stats['statement']:
+        return None
+    if module_stats['fatal']:
+        return 0.0
+    penalty = 5 * module_stats['error'] + module_stats['warning'] + module_stats['refactor'] + module_stats['convention']
+    return max(0.0, 10.0 - penalty / module_stats['statement'] * 10)
+
+def run_pylint(file_paths, jobs=1, rcfile=None):
+    """
+    Lint Python files with a single Pylint run using parallel jobs.
+
+    Files that share a module name are linted in separate runs, because Pylint
+    reports statistics per module name.
+
+    Args:
+        file_paths (list): The paths of the Python files to lint.
+        jobs (int): Most Pylint worker processes per run; 0 uses every CPU. A run never
+            starts more workers than it has files, so a single file is linted in-process.
+        rcfile (str, optional): Path of a Pylint configuration file.
+
+    Returns:
+        dict: For each path, its Pylint score and its messages as dicts with category, symbol, line and msg.
+    """
+    from pylint import lint
+    from pylint.reporters import CollectingReporter
+    batches = []
+    for file_path in file_paths:
+        module = os.path.splitext(os.path.basename(file_path))[0]
+        batch = next((batch for batch in batches if module not in batch), None)
+        if batch is None:
+            batch = {}
+            batches.append(batch)
+        batch[module] = file_path
+
+    results = {}
+    for batch in batches:
+        reporter = CollectingReporter()
+        batch_jobs = min(jobs or os.cpu_count() or 1, len(batch))
+        args = list(batch.values()) + [f"--jobs={batch_jobs}", "--persistent=n"]
+        if rcfile:
+            args.append(f"--rcfile={rcfile}")
+        run = lint.Run(args, reporter=reporter, exit=False)
+        stats = {name.rsplit('.', 1)[-1]: module_stats for name, module_stats in run.linter.stats.by_module.items()}
+
+        paths = {}
+        for module, file_path in batch.items():
+            results[file_path] = {"score": pylint_score(stats.get(module)), "messages": []}
+            paths[os.path.abspath(file_path)] = file_path
+        for message in reporter.messages:
+            file_path = paths.get(os.path.abspath(message.abspath)) or batch.get(message.module.rsplit('.', 1)[-1])
+            if file_path:
+                results[file_path]["messages"].append({"category": message.category, "symbol": message.symbol, "line": message.line, "msg": message.msg})
+        logger.info(f"Pylint run completed for {len(batch)} file(s)")
+    return results
+
+def format_lint_summary(skill, file_path, result):
+    """
+    Summarize a run_pylint result in the format of the given lint skill.
+
+    Args:
+        skill (str): analyze_code or check_code_quality.
+        file_path (str): The path of the linted file.
+        result (dict): The file's entry in the run_pylint result.
+
+    Returns:
+        str: The Pylint score and the errors and warnings found, if any.
+    """
+    title, issues_heading = LINT_SKILLS[skill]
+    issues = [f"{message['category'].upper()}: {message['msg']} (Line: {message['line']})"
+              for message in result["messages"] if message['category'] in LINT_ISSUE_CATEGORIES]
+    score = result["score"]
+    summary = f"{title} for {file_path}:\n"
+    summary += f"Pylint Score: {score:.2f}/10\n" if score is not None else "Pylint Score: n/a\n"
+    if issues:
+        summary += f"{issues_heading}:\n" + "\n".join(issues)
+    else:
+        summary += "No major issues found."
+    return summary
+
 def analyze_code(code_file):
     """
     Perform static code analysis on a given code file using Pylint.
@@ -181,22 +296,8 @@ def analyze_code(code_file):
         str: A summary of the code analysis results, including the Pylint score and any major issues found.
     """
     try:
-        results = lint.Run([code_file], do_exit=False)
-        score = results.linter.stats['global_note']
-        
-        issues = []
-        for message in results.linter.reporter.messages:
-            if message.category in ['error', 'warning']:
-                issues.append(f"{message.category.upper()}: {message.msg} (Line: {message.line})")
-        
-        summary = f"Code Analysis Results for {code_file}:\n"
-        summary += f"Pylint Score: {score:.2f}/10\n"
-        if issues:
-            summary += "Major Issues Found:\n" + "\n".join(issues)
-        else:
-            summary += "No major issues found."
-        
-        logger.info(f"Code analysis completed for {code_file}. Pylint Score: {score:.2f}/10")
+        summary = format_lint_summary('analyze_code', code_file, run_pylint([code_file])[code_file])
+        logger.info(f"Code analysis completed for {code_file}")
         return summary
     except Exception as e:
         logger.exception(f"Error occurred during code analysis for file: {code_file}")
@@ -213,22 +314,8 @@ def check_code_quality(file_path):
         str: The Pylint score and a summary of the issues found, if any.
     """
     try:
-        results = lint.Run([file_path], do_exit=False)
-        score = results.linter.stats['global_note']
-        
-        issues = []
-        for message in results.linter.reporter.messages:
-            if message.category in ['error', 'warning']:
-                issues.append(f"{message.category.upper()}: {message.msg} (Line: {message.line})")
-        
-        summary = f"Code Quality Results for {file_path}:\n"
-        summary += f"Pylint Score: {score:.2f}/10\n"
-        if issues:
-            summary += "Issues Found:\n" + "\n".join(issues)
-        else:
-            summary += "No major issues found."
-        
-        logger.info(f"Code quality check completed for {file_path}. Pylint Score: {score:.2f}/10")
+        summary = format_lint_summary('check_code_quality', file_path, run_pylint([file_path])[file_path])
+        logger.info(f"Code quality check completed for {file_path}")
         return summary
     except Exception as e:
         logger.exception(f"Error occurred during code quality check for file: {file_path}")
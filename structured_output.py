@@ -0,0 +1,91 @@
+import json
+import re
+
+class StructuredOutputError(ValueError):
+    """Raised when an LLM response is not valid JSON or does not match the requested schema."""
+
+JSON_TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'integer': int,
+    'number': (int, float),
+    'boolean': bool,
+}
+
+CODE_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*(.*?)\s*```$", re.DOTALL)
+
+def extract_json(text):
+    """
+    Decode the JSON object in an LLM response.
+
+    Models sometimes wrap the object in a code fence or surround it with prose, so the
+    first complete object in the text is used.
+
+    Args:
+        text (str): The raw response.
+
+    Returns:
+        dict: The decoded object.
+    """
+    text = text.strip()
+    fenced = CODE_FENCE_PATTERN.match(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find('{')
+    if start == -1:
+        raise StructuredOutputError("response does not contain a JSON object")
+    try:
+        data, _ = json.JSONDecoder().raw_decode(text, start)
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"response is not valid JSON: {e}") from e
+    return data
+
+def validate(data, schema, path="$"):
+    """
+    Check data against the subset of JSON Schema used for LLM responses: type,
+    properties, required, items, enum, minItems and maxItems.
+
+    Args:
+        data: The decoded JSON value.
+        schema (dict): The schema to check against.
+        path (str): Location of data in the document, used in error messages.
+    """
+    expected = schema.get('type')
+    if expected:
+        python_type = JSON_TYPES[expected]
+        if not isinstance(data, python_type) or (isinstance(data, bool) and expected in ('integer', 'number')):
+            raise StructuredOutputError(f"{path} should be of type {expected}")
+    if 'enum' in schema and data not in schema['enum']:
+        raise StructuredOutputError(f"{path} should be one of {schema['enum']}")
+
+    if isinstance(data, dict):
+        for key in schema.get('required', []):
+            if key not in data:
+                raise StructuredOutputError(f"{path} is missing required property '{key}'")
+        for key, property_schema in schema.get('properties', {}).items():
+            if key in data:
+                validate(data[key], property_schema, f"{path}.{key}")
+    elif isinstance(data, list):
+        if len(data) < schema.get('minItems', 0):
+            raise StructuredOutputError(f"{path} should have at least {schema['minItems']} items")
+        if 'maxItems' in schema and len(data) > schema['maxItems']:
+            raise StructuredOutputError(f"{path} should have at most {schema['maxItems']} items")
+        if 'items' in schema:
+            for index, item in enumerate(data):
+                validate(item, schema['items'], f"{path}[{index}]")
+
+def parse_structured(text, schema):
+    """
+    Decode an LLM response and validate it against a schema.
+
+    Args:
+        text (str): The raw response.
+        schema (dict): The JSON schema the response must match.
+
+    Returns:
+        dict: The validated object.
+    """
+    data = extract_json(text)
+    validate(data, schema)
+    return data
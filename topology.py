@@ -0,0 +1,121 @@
+import re
+from itertools import combinations
+from config import TOPOLOGY
+
+TOPOLOGY_KINDS = ('all_to_all', 'reporting_lines', 'squads', 'k_nearest')
+
+class Topology:
+    """
+    Undirected communication graph of a team.
+
+    Agents message their neighbours, so the messages, LLM calls and chat rows of a
+    round grow with the number of edges. Squads are named groups that a broadcast
+    can be scoped to.
+    """
+
+    def __init__(self, names, squads=None):
+        self.order = {name: index for index, name in enumerate(names)}
+        self.adjacency = {name: set() for name in names}
+        self.squads = squads or {}
+        self.neighbour_lists = {}
+
+    def add_edge(self, name, other):
+        for agent_name in (name, other):
+            if agent_name not in self.adjacency:
+                raise ValueError(f"Unknown agent in topology: {agent_name}")
+        if name == other:
+            return
+        self.adjacency[name].add(other)
+        self.adjacency[other].add(name)
+        self.neighbour_lists.clear()
+
+    def neighbours(self, name):
+        """Return the names of an agent's neighbours, in team order."""
+        if name not in self.neighbour_lists:
+            self.neighbour_lists[name] = sorted(self.adjacency.get(name, ()), key=self.order.get)
+        return self.neighbour_lists[name]
+
+    def scope(self, name, squad=None):
+        """
+        Return the names a broadcast from an agent reaches.
+
+        Args:
+            name (str): The sending agent.
+            squad (str, optional): One of the sender's squads; defaults to its neighbours.
+
+        Returns:
+            list: The recipient names, excluding the sender.
+        """
+        if squad is None:
+            return self.neighbours(name)
+        members = self.squads.get(squad, [])
+        if name not in members:
+            raise ValueError(f"{name} is not a member of squad '{squad}'")
+        return [member for member in members if member != name]
+
+    def edge_count(self):
+        return sum(len(neighbours) for neighbours in self.adjacency.values()) // 2
+
+
+def profile_words(agent_config):
+    text = ' '.join([agent_config['role'], agent_config['responsibilities']] + list(agent_config['skills']))
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+def nearest_collaborators(agent_configs, k):
+    """
+    Pick each agent's k most similar colleagues.
+
+    Similarity is the Jaccard index of the words in the agents' roles,
+    responsibilities and skills; ties go to the colleague closest in team order.
+
+    Returns:
+        list: (name, name) pairs.
+    """
+    words = [profile_words(agent_config) for agent_config in agent_configs]
+    count = len(agent_configs)
+    pairs = []
+    for i, agent_config in enumerate(agent_configs):
+        def rank(j):
+            similarity = len(words[i] & words[j]) / (len(words[i] | words[j]) or 1)
+            return (-similarity, min((i - j) % count, (j - i) % count), j)
+        nearest = sorted((j for j in range(count) if j != i), key=rank)[:k]
+        pairs.extend((agent_config['name'], agent_configs[j]['name']) for j in nearest)
+    return pairs
+
+def build_topology(agent_configs, settings=TOPOLOGY):
+    """
+    Build the team's communication graph from config.TOPOLOGY.
+
+    Args:
+        agent_configs (list): Agent configuration dicts in the shape of config.AGENTS,
+            optionally with 'reports_to' (a manager's name) and 'squads' (squad names).
+        settings (dict): 'kinds' to combine, 'k' for k_nearest and explicit 'edges'.
+
+    Returns:
+        Topology: The graph. A 'reports_to' naming an agent who is not on the team is ignored.
+    """
+    names = [agent_config['name'] for agent_config in agent_configs]
+    squads = {}
+    for agent_config in agent_configs:
+        for squad in agent_config.get('squads', []):
+            squads.setdefault(squad, []).append(agent_config['name'])
+    topology = Topology(names, squads)
+
+    for kind in settings['kinds']:
+        if kind not in TOPOLOGY_KINDS:
+            raise ValueError(f"Invalid topology kind: {kind}")
+        if kind == 'all_to_all':
+            pairs = combinations(names, 2)
+        elif kind == 'reporting_lines':
+            pairs = [(agent_config['name'], agent_config['reports_to']) for agent_config in agent_configs
+                     if agent_config.get('reports_to') in topology.adjacency]
+        elif kind == 'squads':
+            pairs = [pair for members in squads.values() for pair in combinations(members, 2)]
+        else:
+            pairs = nearest_collaborators(agent_configs, settings.get('k', 3))
+        for name, other in pairs:
+            topology.add_edge(name, other)
+
+    for name, other in settings.get('edges', []):
+        topology.add_edge(name, other)
+    return topology
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from array import array
+from config import WORKSPACE_INDEX_REFRESH_INTERVAL, WORKSPACE_INDEX_MAX_FILE_BYTES
+
+EMPTY_POSTINGS = array('I')
+
+def read_text(path, max_bytes=WORKSPACE_INDEX_MAX_FILE_BYTES):
+    """
+    Read a file as text for indexing.
+
+    Args:
+        path (str): The file to read.
+        max_bytes (int): Files larger than this are not indexed.
+
+    Returns:
+        str: The decoded content, or None for large, binary or non-UTF-8 files.
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = file.read(max_bytes + 1)
+    except OSError:
+        return None
+    if len(data) > max_bytes or b'\0' in data:
+        return None
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+def trigrams(content):
+    return {content[i:i + 3] for i in range(len(content) - 2)}
+
+
+class WorkspaceIndex:
+    """
+    Trigram index over the text files under a workspace directory.
+
+    The content of every indexed file is kept in memory, with a posting list of file
+    ids for each trigram. A query intersects the posting lists of its rarest trigrams
+    and confirms the few candidate files with a substring scan, so it never touches
+    the disk. The Environment updates the index as agents write files. Edits made
+    outside the Environment are picked up by refresh(), an mtime and size check of
+    the whole tree that the Environment runs on a worker thread once stale() reports
+    the last one is over refresh_interval seconds old. Binary and non-UTF-8 files
+    are not indexed.
+
+    The methods are thread-safe. refresh() reads files without holding the lock, so
+    searches keep being served while it runs.
+
+    Every update takes a new id, skipped files included, so ids also order updates:
+    refresh() only drops the missing files indexed before it started, not the ones
+    the Environment wrote while it was walking the tree. The ids of old versions stay
+    in the posting lists until enough have accumulated to compact them.
+    """
+
+    def __init__(self, root, refresh_interval=WORKSPACE_INDEX_REFRESH_INTERVAL, max_file_bytes=WORKSPACE_INDEX_MAX_FILE_BYTES):
+        self.root = os.path.realpath(root)
+        self.refresh_interval = refresh_interval
+        self.max_file_bytes = max_file_bytes
+        self.paths = {}
+        self.files = {}
+        self.skipped = {}
+        self.postings = {}
+        self.stale_ids = 0
+        self.next_id = 0
+        self.last_refresh = None
+        self.lock = threading.RLock()
+
+    def update(self, path, content=None, content_trigrams=None):
+        """
+        Index the current version of a file.
+
+        Args:
+            path (str): The file's path.
+            content (str, optional): The file's content, if already known.
+            content_trigrams (set, optional): trigrams(content), if already computed.
+        """
+        path = os.path.realpath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.remove(path)
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if content is None:
+            content = read_text(path, self.max_file_bytes)
+        elif len(content) > self.max_file_bytes:
+            content = None
+        if content is not None and content_trigrams is None:
+            content_trigrams = trigrams(content)
+
+        with self.lock:
+            self.remove(path)
+            file_id = self.next_id
+            self.next_id += 1
+            if content is None:
+                self.skipped[path] = (file_id, signature)
+                return
+
+            self.paths[path] = file_id
+            self.files[file_id] = (path, signature, content)
+            postings = self.postings
+            for trigram in content_trigrams:
+                if trigram in postings:
+                    postings[trigram].append(file_id)
+                else:
+                    postings[trigram] = array('I', (file_id,))
+
+    def remove(self, path):
+        path = os.path.realpath(path)
+        with self.lock:
+            self.skipped.pop(path, None)
+            file_id = self.paths.pop(path, None)
+            if file_id is None:
+                return
+            del self.files[file_id]
+            self.stale_ids += 1
+            if self.stale_ids > max(1024, len(self.files)):
+                self.compact()
+
+    def compact(self):
+        with self.lock:
+            for trigram, postings in list(self.postings.items()):
+                live = array('I', (file_id for file_id in postings if file_id in self.files))
+                if live:
+                    self.postings[trigram] = live
+                else:
+                    del self.postings[trigram]
+            self.stale_ids = 0
+
+    def stale(self):
+        return self.last_refresh is None or time.monotonic() - self.last_refresh > self.refresh_interval
+
+    def refresh(self):
+        with self.lock:
+            started = self.next_id
+        seen = set()
+        for directory, _, file_names in os.walk(self.root):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                seen.add(path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                signature = (stat.st_mtime_ns, stat.st_size)
+                with self.lock:
+                    file_id = self.paths.get(path)
+                    known = self.files[file_id][1] if file_id is not None else self.skipped.get(path, (None, None))[1]
+                if known != signature:
+                    self.update(path)
+        with self.lock:
+            missing = [path for path, file_id in self.paths.items() if path not in seen and file_id < started]
+            missing += [path for path, (file_id, _) in self.skipped.items() if path not in seen and file_id < started]
+            for path in missing:
+                self.remove(path)
+        self.last_refresh = time.monotonic()
+
+    def search(self, keyword, directory=None, limit=None):
+        """
+        Find the lines containing keyword.
+
+        Args:
+            keyword (str): The text to search for (case-sensitive).
+            directory (str, optional): Only search files under this directory.
+            limit (int, optional): Maximum number of matches to return.
+
+        Returns:
+            list: (path, line number, line) tuples ordered by path and line.
+        """
+        if not keyword:
+            return []
+        with self.lock:
+            if len(keyword) >= 3:
+                postings = sorted((self.postings.get(keyword[i:i + 3], EMPTY_POSTINGS) for i in range(len(keyword) - 2)), key=len)
+                candidates = set(postings[0])
+                for other in postings[1:3]:
+                    if not candidates:
+                        break
+                    candidates.intersection_update(other)
+            else:
+                candidates = self.files.keys()
+
+            prefix = os.path.realpath(directory) + os.sep if directory else None
+            entries = sorted(self.files[file_id] for file_id in candidates if file_id in self.files)
+            matches = []
+            for path, _, content in entries:
+                if prefix and not path.startswith(prefix):
+                    continue
+                start = content.find(keyword)
+                while start != -1:
+                    line_start = content.rfind('\n', 0, start) + 1
+                    line_end = content.find('\n', start)
+                    if line_end == -1:
+                        line_end = len(content)
+                    matches.append((path, content.count('\n', 0, start) + 1, content[line_start:line_end]))
+                    if limit and len(matches) >= limit:
+                        return matches
+                    start = content.find(keyword, line_end)
+            return matches
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import WORKSPACE_IO_WORKERS, WORKSPACE_WRITE_COALESCE_WINDOW, WORKSPACE_READ_CACHE_ENTRIES, WORKSPACE_READ_CACHE_MAX_FILE_BYTES
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def atomic_write(path, content):
+    """
+    Write a text file atomically: readers and crashes see the old or the new content, never a mix.
+
+    Args:
+        path (str): The file to write.
+        content (str): The new content.
+
+    Returns:
+        tuple: The (mtime_ns, size) signature of the written file.
+    """
+    directory = os.path.dirname(path) or '.'
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(content)
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return file_signature(path)
+
+def read_with_signature(path):
+    with open(path, 'r') as file:
+        content = file.read()
+    return content, file_signature(path)
+
+class PendingWrite:
+    def __init__(self, content, future):
+        self.content = content
+        self.future = future
+
+
+class WorkspaceFiles:
+    """
+    Asynchronous, atomic file access for agent workspaces.
+
+    Blocking calls run on a small thread pool instead of the event loop. Every write
+    goes to a temporary file that replaces the target, so a crash never leaves a
+    truncated file. Writes to a path are applied in order, and writes that arrive
+    within coalesce_window seconds of each other (or while the previous write is
+    still on disk) are coalesced into one write of the last content, which every
+    caller awaits. edit() runs read-modify-write updates of a path one at a time.
+    Small files read or written recently stay in an LRU read cache; a hit is
+    checked against the file's mtime and size, so edits made by skills or other
+    processes are still seen.
+
+    on_write, if given, is awaited with the path and content after each write that
+    reaches the disk, before the writers are resumed.
+    """
+
+    def __init__(self, max_workers=WORKSPACE_IO_WORKERS, coalesce_window=WORKSPACE_WRITE_COALESCE_WINDOW,
+                 cache_entries=WORKSPACE_READ_CACHE_ENTRIES, cache_max_file_bytes=WORKSPACE_READ_CACHE_MAX_FILE_BYTES, on_write=None):
+        self.on_write = on_write
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='workspace-io')
+        self.coalesce_window = coalesce_window
+        self.cache_entries = cache_entries
+        self.cache_max_file_bytes = cache_max_file_bytes
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.writing = {}
+        self.tasks = set()
+        self.edit_locks = {}
+        self.writes_requested = 0
+        self.writes_performed = 0
+
+    async def run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def read(self, path):
+        """
+        Read a text file, from the cache if it is unchanged on disk.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+        """
+        entry = self.cache.get(path)
+        if entry is not None:
+            content, signature = entry
+            # A write still in flight has no signature yet; its content is the newest.
+            if signature is None or self.signature_matches(path, signature):
+                self.cache.move_to_end(path)
+                return content
+            del self.cache[path]
+        content, signature = await self.run(read_with_signature, path)
+        self.remember(path, content, signature)
+        return content
+
+    async def write(self, path, content):
+        """Atomically replace the content of a text file, coalescing rapid writes to the same path."""
+        self.writes_requested += 1
+        self.remember(path, content, None)
+        pending = self.pending.get(path)
+        if pending is not None:
+            pending.content = content
+        else:
+            pending = self.pending[path] = PendingWrite(content, asyncio.get_running_loop().create_future())
+            previous = self.writing.get(path)
+            self.writing[path] = pending.future
+            task = asyncio.create_task(self.flush(path, pending, previous))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        await asyncio.shield(pending.future)
+
+    async def flush(self, path, pending, previous):
+        await asyncio.sleep(self.coalesce_window)
+        if previous is not None:
+            await asyncio.wait([previous])
+        del self.pending[path]
+        try:
+            signature = await self.run(atomic_write, path, pending.content)
+            self.writes_performed += 1
+            entry = self.cache.get(path)
+            if entry is not None and entry[0] is pending.content:
+                self.cache[path] = (pending.content, signature)
+            if self.on_write:
+                await self.on_write(path, pending.content)
+            pending.future.set_result(None)
+        except Exception as e:
+            self.cache.pop(path, None)
+            pending.future.set_exception(e)
+        finally:
+            if self.writing.get(path) is pending.future:
+                del self.writing[path]
+
+    async def edit(self, path, change):
+        """
+        Replace a text file's content with change(content).
+
+        Edits of the same path run one at a time, so concurrent edits are not lost.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+        """
+        lock, users = self.edit_locks.get(path, (asyncio.Lock(), 0))
+        self.edit_locks[path] = (lock, users + 1)
+        try:
+            async with lock:
+                content = await self.read(path)
+                await self.write(path, change(content))
+        finally:
+            lock, users = self.edit_locks[path]
+            if users == 1:
+                del self.edit_locks[path]
+            else:
+                self.edit_locks[path] = (lock, users - 1)
+
+    async def delete(self, path):
+        """
+        Delete a file once any write to it has finished.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+        """
+        previous = self.writing.get(path)
+        if previous is not None:
+            await asyncio.wait([previous])
+        self.cache.pop(path, None)
+        await self.run(os.remove, path)
+
+    async def listdir(self, path):
+        return await self.run(os.listdir, path)
+
+    async def makedirs(self, path):
+        await self.run(lambda: os.makedirs(path, exist_ok=True))
+
+    def signature_matches(self, path, signature):
+        try:
+            return file_signature(path) == signature
+        except OSError:
+            return False
+
+    def remember(self, path, content, signature):
+        if len(content) > self.cache_max_file_bytes:
+            self.cache.pop(path, None)
+            return
+        self.cache[path] = (content, signature)
+        self.cache.move_to_end(path)
+        while len(self.cache) > self.cache_entries:
+            self.cache.popitem(last=False)
+
+    def close(self):
+        self.executor.shutdown(wait=True)